@@ -0,0 +1,148 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute, Match
+
+# Endpoints that run bcrypt, capped together as the "auth" class
+PASSWORD_PATHS = frozenset(("/api/auth/register", "/api/auth/login"))
+
+
+def endpoint_class(method: str, path: str) -> Optional[str]:
+    """The class whose concurrency limit a request counts against ("auth" for
+    the password endpoints, "reads", "writes" or "analytics"), or None for
+    requests admission control leaves alone (health checks, /metrics, CORS
+    preflights)."""
+    if not path.startswith("/api/") or path == "/api/health" or method == "OPTIONS":
+        return None
+    if path in PASSWORD_PATHS:
+        return "auth"
+    if path.startswith("/api/analytics"):
+        return "analytics"
+    return "reads" if method in ("GET", "HEAD") else "writes"
+
+
+class TokenBuckets:
+    """One token bucket per key, holding up to ``burst`` tokens and refilled
+    at ``rate`` tokens a second. The ``max_keys`` least recently used buckets
+    are kept; a key seen again after eviction starts with a full bucket."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, cost: float = 1) -> float:
+        """Take ``cost`` tokens from ``key``'s bucket: 0 if they were there,
+        otherwise nothing is taken and the seconds until they will be."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0
+        return (cost - bucket[0]) / self.rate
+
+
+class AdmissionController:
+    """Decides whether a request is served at all, before any work is done.
+
+    Each signed-in user draws one token per request from their bucket in
+    ``buckets`` (None disables rate limiting), so one client looping on an
+    endpoint gets 429s instead of a share of the event loop and the writer.
+    Each endpoint class has a cap on requests served at once; past it the
+    request gets an immediate 503 rather than queueing behind the others,
+    which keeps the latency of admitted requests bounded during a burst.
+    Both carry Retry-After.
+    """
+
+    def __init__(self, limits: Dict[str, int], buckets: Optional[TokenBuckets]):
+        self.limits = limits
+        self.buckets = buckets
+        self.in_flight = {name: 0 for name in limits}
+        self.rejected = {(name, reason): 0 for name in limits for reason in ("rate_limited", "over_capacity")}
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": dict(self.in_flight),
+            "limits": dict(self.limits),
+            "rate_limited": {name: self.rejected[(name, "rate_limited")] for name in self.limits},
+            "over_capacity": {name: self.rejected[(name, "over_capacity")] for name in self.limits},
+            "users_tracked": len(self.buckets) if self.buckets is not None else 0,
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying ``controller`` to every HTTP request.
+
+    ``subject`` maps a bearer token to the verified user it was issued to,
+    or None; requests without a valid token are not rate limited (the
+    endpoint rejects them, or they are sign-ins), only capped per class.
+    A rejected request never reaches the router, so its route is looked up
+    in ``routes`` and set in the scope for the metrics to label it by.
+    """
+
+    def __init__(self, app, controller: AdmissionController, subject: Callable[[str], Optional[str]],
+                 routes: Sequence[BaseRoute] = ()):
+        self.app = app
+        self.controller = controller
+        self.subject = subject
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        name = endpoint_class(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            return await self.app(scope, receive, send)
+        controller = self.controller
+
+        if controller.buckets is not None:
+            key = self._subject(scope)
+            wait = controller.buckets.take(key) if key is not None else 0
+            if wait:
+                controller.rejected[(name, "rate_limited")] += 1
+                self._set_route(scope)
+                response = JSONResponse(status_code=429, content={"detail": "Too many requests"},
+                                        headers={"Retry-After": str(math.ceil(wait))})
+                return await response(scope, receive, send)
+
+        if controller.in_flight[name] >= controller.limits[name]:
+            controller.rejected[(name, "over_capacity")] += 1
+            self._set_route(scope)
+            response = JSONResponse(status_code=503, content={"detail": "Server busy, please retry"},
+                                    headers={"Retry-After": "1"})
+            return await response(scope, receive, send)
+
+        controller.in_flight[name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight[name] -= 1
+
+    def _subject(self, scope) -> Optional[str]:
+        for header, value in scope["headers"]:
+            if header == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    return self.subject(token.strip())
+                return None
+        return None
+
+    def _set_route(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route"] = route
+                return
@@ -0,0 +1,189 @@
+"""Aggregation behind GET /analytics.
+
+All grouping happens in SQL. Per-day values come pre-aggregated from the
+``daily_rollups`` table and are bucketed into days, weeks (starting Monday)
+or months with a ``GROUP BY``. Per-habit completion counts and the
+sleep/focus split each come from one more ``GROUP BY``. Python only sees
+one row per bucket, per habit and per sleep class, so the cost and memory
+depend on the number of buckets and habits, not on the window length or
+how many logs or sessions a user writes per day.
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from storage_codecs import day_to_date
+
+WINDOW_DAYS = 7
+LOW_SLEEP_HOURS = 6
+
+# SQL expression mapping a rollup day number to the first day of its
+# bucket. Day 0, 1970-01-01, was a Thursday.
+BUCKET_SQL = {
+    "day": "date",
+    "week": "date - ((date + 3) % 7 + 7) % 7",
+    "month": "unixepoch(date * 86400, 'unixepoch', 'start of month') / 86400",
+}
+GRANULARITIES = tuple(BUCKET_SQL)
+
+
+def bucket_keys(start: date, end: date, granularity: str) -> List[str]:
+    """First day of every bucket overlapping ``start``..``end``, in order."""
+    if granularity == "week":
+        current = start - timedelta(days=start.weekday())
+    elif granularity == "month":
+        current = start.replace(day=1)
+    else:
+        current = start
+    keys = []
+    while current <= end:
+        keys.append(current.strftime("%Y-%m-%d"))
+        if granularity == "week":
+            current += timedelta(days=7)
+        elif granularity == "month":
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+    return keys
+
+
+async def fetch_window(db, user_id, start: date, end: date, granularity: str):
+    """Load per-bucket totals, the sleep/focus split, per-habit completions
+    and habits for ``start``..``end`` (inclusive)."""
+    async with db.execute(
+        f"""SELECT {BUCKET_SQL[granularity]} AS bucket,
+                   SUM(habits_completed) AS habits_completed,
+                   SUM(focus_minutes) AS focus_minutes,
+                   COUNT(mood_level) AS mood_days,
+                   SUM(mood_level) AS mood_total,
+                   SUM(energy_level) AS energy_total,
+                   SUM(sleep_hours) AS sleep_total
+            FROM daily_rollups WHERE user_id = ? AND date >= ? AND date <= ?
+            GROUP BY bucket ORDER BY bucket""",
+        (user_id, start, end)
+    ) as cursor:
+        buckets = [dict(row) for row in await cursor.fetchall()]
+    for bucket in buckets:
+        # Day buckets select the bare column and come back as dates already
+        first_day = bucket["bucket"]
+        if not isinstance(first_day, date):
+            first_day = day_to_date(first_day)
+        bucket["bucket"] = first_day.strftime("%Y-%m-%d")
+
+    # Focus on days with a mood entry, split by whether sleep was short
+    async with db.execute(
+        """SELECT sleep_hours < ? AS low_sleep, SUM(focus_minutes) AS focus_minutes,
+                  SUM(focus_sessions) AS focus_sessions
+           FROM daily_rollups
+           WHERE user_id = ? AND date >= ? AND date <= ? AND mood_level IS NOT NULL AND focus_sessions > 0
+           GROUP BY low_sleep""",
+        (LOW_SLEEP_HOURS, user_id, start, end)
+    ) as cursor:
+        sleep_focus = {
+            "low" if row["low_sleep"] else "high": (row["focus_minutes"], row["focus_sessions"])
+            for row in await cursor.fetchall()
+        }
+
+    async with db.execute(
+        """SELECT habit_id, COUNT(*) AS completed FROM habit_logs
+           WHERE user_id = ? AND date >= ? AND date <= ? AND completed GROUP BY habit_id""",
+        (user_id, start, end)
+    ) as cursor:
+        completed_by_habit = {row["habit_id"]: row["completed"] for row in await cursor.fetchall()}
+
+    async with db.execute(
+        "SELECT id, name FROM habits WHERE user_id = ?",
+        (user_id,)
+    ) as cursor:
+        habits = [dict(row) for row in await cursor.fetchall()]
+
+    return buckets, sleep_focus, completed_by_habit, habits
+
+
+def summarize(buckets: List[dict], sleep_focus: Dict[str, tuple], completed_by_habit: dict,
+              habits: List[dict], keys: List[str], expected_days: int, granularity: str = "day") -> dict:
+    """Build the analytics payload from grouped rows in linear time.
+
+    A day holds at most one mood entry, so daily chart points keep the
+    entry's integer levels; week and month points are averages.
+    """
+    completed_habits = 0
+    total_focus_minutes = 0
+    mood_days = 0
+    mood_total = energy_total = sleep_total = 0
+    focus_by_bucket = {}
+    mood_chart_data = []
+
+    for bucket in buckets:
+        completed_habits += bucket["habits_completed"]
+        total_focus_minutes += bucket["focus_minutes"]
+        focus_by_bucket[bucket["bucket"]] = bucket["focus_minutes"]
+        if not bucket["mood_days"]:
+            continue
+        mood_days += bucket["mood_days"]
+        mood_total += bucket["mood_total"]
+        energy_total += bucket["energy_total"]
+        sleep_total += bucket["sleep_total"]
+        if granularity == "day":
+            mood, energy = bucket["mood_total"], bucket["energy_total"]
+        else:
+            mood = round(bucket["mood_total"] / bucket["mood_days"], 1)
+            energy = round(bucket["energy_total"] / bucket["mood_days"], 1)
+        mood_chart_data.append({"date": bucket["bucket"], "mood": mood, "energy": energy})
+
+    expected_completions = len(habits) * expected_days
+    completion_rate = (completed_habits / expected_completions * 100) if expected_completions > 0 else 0
+
+    weekly_stats = {
+        "total_habits_completed": completed_habits,
+        "total_focus_minutes": total_focus_minutes,
+        "average_mood": round(mood_total / mood_days, 1) if mood_days else 0,
+        "average_energy": round(energy_total / mood_days, 1) if mood_days else 0,
+        "average_sleep": round(sleep_total / mood_days, 1) if mood_days else 0,
+        "habit_completion_rate": round(completion_rate, 1),
+    }
+
+    # Sleep vs Focus correlation: average session length on short- vs long-sleep days
+    insights = []
+    if "low" in sleep_focus and "high" in sleep_focus:
+        avg_low = sleep_focus["low"][0] / sleep_focus["low"][1]
+        avg_high = sleep_focus["high"][0] / sleep_focus["high"][1]
+        diff_pct = abs(avg_high - avg_low) / avg_high * 100 if avg_high > 0 else 0
+        if avg_low < avg_high:
+            insights.append({
+                "type": "sleep_focus",
+                "title": "Sleep Affects Focus",
+                "description": f"On days you sleep < {LOW_SLEEP_HOURS} hours, your focus drops by {round(diff_pct)}%",
+                "value": f"{round(diff_pct)}%",
+                "trend": "down",
+            })
+
+    habit_streaks = {habit["name"]: completed_by_habit.get(habit["id"], 0) for habit in habits}
+
+    focus_chart_data = [{"date": key, "minutes": focus_by_bucket.get(key, 0)} for key in keys]
+
+    return {
+        "weekly_stats": weekly_stats,
+        "insights": insights,
+        "habit_streaks": habit_streaks,
+        "mood_chart_data": mood_chart_data,
+        "focus_chart_data": focus_chart_data,
+    }
+
+
+def default_window(today: date):
+    """The original trailing window: the last ``WINDOW_DAYS`` days plus today."""
+    return today - timedelta(days=WINDOW_DAYS), today
+
+
+async def compute_analytics(db, user_id, start: date, end: date, granularity: str = "day",
+                            expected_days: Optional[int] = None) -> dict:
+    """Analytics for ``start``..``end`` inclusive.
+
+    ``expected_days`` is the number of days each habit is expected to be
+    completed for the completion rate; it defaults to the window length.
+    """
+    if expected_days is None:
+        expected_days = (end - start).days + 1
+    buckets, sleep_focus, completed_by_habit, habits = await fetch_window(db, user_id, start, end, granularity)
+    return summarize(buckets, sleep_focus, completed_by_habit, habits,
+                     bucket_keys(start, end, granularity), expected_days, granularity)
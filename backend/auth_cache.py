@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+class UserCache:
+    """Bounded LRU of verified bearer tokens mapped to user rows.
+
+    An entry lives for at most ``ttl_seconds`` and never past the token's own
+    ``exp`` claim, so a hit can skip both signature verification and the user
+    lookup without ever accepting a token that ``jwt.decode`` would reject as
+    expired. Call ``invalidate_user`` whenever a user row changes.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.time():
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def put(self, token: str, user: dict, token_exp: float):
+        if self.max_entries <= 0:
+            return
+        expires_at = min(time.time() + self.ttl_seconds, token_exp)
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = (expires_at, user)
+        self._tokens_by_user.setdefault(user["id"], set()).add(token)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate_user(self, user_id: str):
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def _remove(self, token: str):
+        _, user = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user["id"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user["id"]]
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the acquire timeout."""
+
+
+# Called after every call a connection runs on its thread (``execute``,
+# ``fetchall``, ``commit``...) with the connection, the function and its
+# arguments, its result (None if it raised) and how long the caller waited
+# for it, in seconds
+CallObserver = Callable[["ObservedConnection", Callable, tuple, Any, float], None]
+
+
+class ObservedConnection(aiosqlite.Connection):
+    """aiosqlite connection that reports every call it makes to ``observer``.
+
+    Statements, cursor fetches and commits all reach the connection's thread
+    through ``_execute``, so timing it there covers them all.
+    """
+
+    def __init__(self, path: Path, connector: Callable[[], sqlite3.Connection], observer: CallObserver):
+        super().__init__(connector, iter_chunk_size=64)
+        self.path = path
+        self._observer = observer
+
+    async def _execute(self, fn, *args, **kwargs):
+        began = time.perf_counter()
+        result = None
+        try:
+            result = await super()._execute(fn, *args, **kwargs)
+            return result
+        finally:
+            self._observer(self, fn, args, result, time.perf_counter() - began)
+
+
+class ConnectionPool:
+    """Fixed-size pool of long-lived aiosqlite connections.
+
+    Each aiosqlite connection owns a worker thread, so opening one per request
+    means a thread spawn and teardown on every call. The pool opens ``size``
+    connections once at startup, applies the per-connection pragmas a single
+    time, and hands them out for the duration of a request.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        size: int = 5,
+        busy_timeout_ms: int = 5000,
+        cache_size_kib: int = 8192,
+        mmap_size: int = 64 * 1024 * 1024,
+        acquire_timeout: float = 10.0,
+        detect_types: int = 0,
+        observer: Optional[CallObserver] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.acquire_timeout = acquire_timeout
+        self.detect_types = detect_types
+        self.observer = observer
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+
+    async def connect(self) -> aiosqlite.Connection:
+        """Open a standalone connection configured like the pooled ones."""
+        if self.observer is None:
+            db = await aiosqlite.connect(self.path, detect_types=self.detect_types)
+        else:
+            db = await ObservedConnection(
+                self.path, lambda: sqlite3.connect(str(self.path), detect_types=self.detect_types), self.observer
+            )
+        db.row_factory = aiosqlite.Row
+        await db.executescript(f"""
+            PRAGMA busy_timeout = {int(self.busy_timeout_ms)};
+            PRAGMA synchronous = NORMAL;
+            PRAGMA cache_size = -{int(self.cache_size_kib)};
+            PRAGMA mmap_size = {int(self.mmap_size)};
+        """)
+        return db
+
+    async def open(self):
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        for i in range(self.size):
+            db = await self.connect()
+            if i == 0:
+                # journal_mode is persistent in the database file, so setting it
+                # on the first connection is enough for every later one.
+                await db.executescript("PRAGMA journal_mode = WAL;")
+            self._connections.append(db)
+            self._idle.put_nowait(db)
+        logger.info(f"Opened SQLite pool of {self.size} connections to {self.path}")
+
+    async def close(self):
+        if self._idle is None:
+            return
+        for db in self._connections:
+            await db.close()
+        self._connections = []
+        self._idle = None
+
+    @property
+    def available(self) -> int:
+        return self._idle.qsize() if self._idle is not None else 0
+
+    async def _acquire(self) -> aiosqlite.Connection:
+        if self._idle is None:
+            raise RuntimeError("Connection pool is not open")
+        try:
+            return await asyncio.wait_for(self._idle.get(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No database connection available after {self.acquire_timeout}s")
+
+    async def _discard(self, db: aiosqlite.Connection) -> aiosqlite.Connection:
+        """Replace a connection whose state can no longer be trusted."""
+        self._connections.remove(db)
+        try:
+            await db.close()
+        except Exception:
+            logger.exception("Failed to close broken SQLite connection")
+        fresh = await self.connect()
+        self._connections.append(fresh)
+        return fresh
+
+    @asynccontextmanager
+    async def connection(self):
+        db = await self._acquire()
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                try:
+                    await db.rollback()
+                except Exception:
+                    db = await self._discard(db)
+            self._idle.put_nowait(db)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Yield a pooled connection and commit on success, roll back on error."""
+        async with self.connection() as db:
+            yield db
+            await db.commit()
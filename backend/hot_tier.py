@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Sequence, Set, Tuple
+
+from shards import ShardRouter
+from write_queue import WriteOp
+
+logger = logging.getLogger(__name__)
+
+
+class UserWindow:
+    """One user's recent days: their habit ids and every habit log and mood
+    entry dated on or after ``start``, as the rows the database returns."""
+
+    __slots__ = ("start", "habit_ids", "logs", "moods")
+
+    def __init__(self, start: date):
+        self.start = start
+        self.habit_ids: Set[uuid.UUID] = set()
+        self.logs: Dict[Tuple[uuid.UUID, date], dict] = {}
+        self.moods: Dict[date, dict] = {}
+
+
+class HotTier:
+    """In-memory copy of active users' last ``days`` days, written behind.
+
+    Nearly all traffic touches today and this week, so the writes and reads
+    of that window are served from a per-user ``UserWindow`` loaded on first
+    use. A write updates the window and is queued on the user's group-commit
+    writer without waiting for the commit, so it is on disk within the
+    writer's batch delay; a failed write drops the window so the next access
+    reloads what was actually committed. Anything that reads the database
+    for a user first waits (``settle``) for that user's queued writes, so it
+    never sees an older state than the window. Writes made elsewhere must
+    ``evict`` the window. On shutdown ``drain`` waits for every queued write.
+
+    Acknowledged writes that are still queued are lost if the process dies
+    without shutting down.
+    """
+
+    def __init__(self, shards: ShardRouter, days: int, max_users: int,
+                 log_columns: Sequence[str], mood_columns: Sequence[str]):
+        self.shards = shards
+        self.days = days
+        self.max_users = max_users
+        self.log_columns = tuple(log_columns)
+        self.mood_columns = tuple(mood_columns)
+        self._windows: "OrderedDict[uuid.UUID, UserWindow]" = OrderedDict()
+        self._pending: Dict[uuid.UUID, Set[asyncio.Future]] = {}
+        # Bumped by every eviction; a load that raced one is not kept
+        self._evictions = 0
+        self.hits = 0
+        self.loads = 0
+        self.writes_behind = 0
+        self.writes_failed = 0
+
+    def window_start(self) -> date:
+        return datetime.utcnow().date() - timedelta(days=self.days - 1)
+
+    async def window(self, user_id: uuid.UUID) -> UserWindow:
+        window = self._windows.get(user_id)
+        if window is not None and window.start == self.window_start():
+            self._windows.move_to_end(user_id)
+            self.hits += 1
+            return window
+
+        evictions = self._evictions
+        window = await self._load(user_id)
+        self.loads += 1
+        if evictions != self._evictions:
+            return window
+        current = self._windows.get(user_id)
+        if current is not None and current.start == window.start:
+            # Another request loaded it meanwhile and may have written to it
+            return current
+        self._windows[user_id] = window
+        self._windows.move_to_end(user_id)
+        while len(self._windows) > self.max_users:
+            self._windows.popitem(last=False)
+        return window
+
+    async def _load(self, user_id: uuid.UUID) -> UserWindow:
+        await self.settle(user_id)
+        window = UserWindow(self.window_start())
+        async with self.shards.pool(user_id).transaction() as db:
+            async with db.execute("SELECT id FROM habits WHERE user_id = ?", (user_id,)) as cursor:
+                window.habit_ids = {row["id"] for row in await cursor.fetchall()}
+            async with db.execute(
+                f"SELECT {', '.join(self.log_columns)} FROM habit_logs WHERE user_id = ? AND date >= ?",
+                (user_id, window.start)
+            ) as cursor:
+                for row in await cursor.fetchall():
+                    window.logs[(row["habit_id"], row["date"])] = dict(zip(self.log_columns, row))
+            async with db.execute(
+                f"SELECT {', '.join(self.mood_columns)} FROM mood_entries WHERE user_id = ? AND date >= ?",
+                (user_id, window.start)
+            ) as cursor:
+                for row in await cursor.fetchall():
+                    window.moods[row["date"]] = dict(zip(self.mood_columns, row))
+        return window
+
+    def evict(self, user_id: uuid.UUID):
+        self._evictions += 1
+        self._windows.pop(user_id, None)
+
+    def write_behind(self, user_id: uuid.UUID, op: WriteOp):
+        """Queue ``op`` on the user's writer; raises WriteQueueFull at once if
+        the queue is full, so update the window only after this returns."""
+        future = self.shards.writer(user_id).enqueue(op)
+        self.writes_behind += 1
+        self._pending.setdefault(user_id, set()).add(future)
+        future.add_done_callback(lambda done: self._written(user_id, done))
+
+    def _written(self, user_id: uuid.UUID, future: asyncio.Future):
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending.discard(future)
+            if not pending:
+                del self._pending[user_id]
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or error is not None:
+            self.writes_failed += 1
+            logger.error("Write-behind for user %s failed: %r", user_id, error)
+            self.evict(user_id)
+
+    async def settle(self, user_id: uuid.UUID):
+        """Wait until every write queued for ``user_id`` so far is committed."""
+        pending = self._pending.get(user_id)
+        if pending:
+            await asyncio.wait(list(pending))
+
+    async def drain(self):
+        """Wait for every queued write; call before stopping the writers."""
+        futures: List[asyncio.Future] = [future for pending in self._pending.values() for future in pending]
+        if futures:
+            await asyncio.wait(futures)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._windows),
+            "pending_writes": sum(len(pending) for pending in self._pending.values()),
+            "hits": self.hits,
+            "loads": self.loads,
+            "writes_behind": self.writes_behind,
+            "writes_failed": self.writes_failed,
+        }
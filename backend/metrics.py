@@ -0,0 +1,256 @@
+import asyncio
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+# aiosqlite calls that run a statement; args[0] is the SQL
+STATEMENT_CALLS = frozenset(("execute", "executemany", "executescript", "_execute_fetchall", "_execute_insert"))
+# First keywords kept as the ``operation`` label; anything else is "other"
+STATEMENT_KINDS = frozenset((
+    "select", "insert", "update", "delete", "replace", "with", "begin", "commit", "rollback",
+    "savepoint", "release", "pragma", "create", "drop", "alter", "attach", "detach", "analyze",
+))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (not cumulative) + overflow, sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """A value set or moved by the app, or read from ``collect`` at scrape time
+    as ``[(label values, value), ...]``."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Sequence[Tuple[Sequence[str], float]]]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    type = "gauge"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        samples = self.collect() if self.collect is not None else [((), self.value)]
+        for labels, value in samples:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """A total that only goes up; like Gauge, it may be read from ``collect``."""
+
+    type = "counter"
+
+
+class RequestMetrics:
+    """Database work done on behalf of the current request."""
+
+    __slots__ = ("statements", "db_seconds", "by_sql")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # SQL text -> times run, filled in by QueryLog
+        self.by_sql = {}
+
+
+# Set by MetricsMiddleware for the duration of each HTTP request
+request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def statement_kind(sql: str) -> str:
+    words = sql.split(None, 1)
+    kind = words[0].lower() if words else ""
+    return kind if kind in STATEMENT_KINDS else "other"
+
+
+class Instrumentation:
+    """Prometheus metrics for the app: request latency by route template and
+    status, in-flight requests, SQLite call latency by operation, statements
+    and database time per request, and event-loop lag.
+
+    Everything is plain counters in dicts updated on the event loop, so it
+    costs a few hundred nanoseconds per request and per database call.
+    """
+
+    def __init__(self, namespace: str):
+        self._metrics: List = []
+        self.requests = self.histogram(
+            f"{namespace}_http_request_duration_seconds", "HTTP request latency, until the response is sent.",
+            ("method", "route", "status"))
+        self.in_flight = self.gauge(f"{namespace}_http_requests_in_flight", "HTTP requests being served.")
+        self.request_statements = self.histogram(
+            f"{namespace}_http_request_db_statements", "SQL statements run per HTTP request.",
+            ("route",), COUNT_BUCKETS)
+        self.request_db_seconds = self.histogram(
+            f"{namespace}_http_request_db_seconds", "Time per HTTP request spent waiting on SQLite calls.",
+            ("route",))
+        self.db_calls = self.histogram(
+            f"{namespace}_db_call_duration_seconds",
+            "SQLite call latency, including the wait for the connection's thread, by statement kind or call.",
+            ("operation",), DB_CALL_BUCKETS)
+        self.loop_lag = self.histogram(
+            f"{namespace}_event_loop_lag_seconds", "How late the event loop ran a timer due now.",
+            buckets=LOOP_LAG_BUCKETS)
+        self._loop_watch: Optional[asyncio.Task] = None
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        metric = Gauge(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = [line for metric in self._metrics for line in metric.render()]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def observe_db_call(self, db, fn, args: tuple, result, seconds: float):
+        """``ConnectionPool`` observer: one call run on a connection's thread."""
+        stats = request_metrics.get()
+        name = fn.__name__
+        if name in STATEMENT_CALLS:
+            operation = statement_kind(args[0]) if args else "other"
+            if stats is not None:
+                stats.statements += 1
+        else:
+            operation = name
+        self.db_calls.observe(seconds, operation)
+        if stats is not None:
+            stats.db_seconds += seconds
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestMetrics):
+        self.requests.observe(seconds, method, route, str(status))
+        self.request_statements.observe(stats.statements, route)
+        self.request_db_seconds.observe(stats.db_seconds, route)
+
+    async def _watch_loop(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            began = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(0.0, loop.time() - began - interval))
+
+    def start_loop_watch(self, interval: float):
+        if self._loop_watch is None:
+            self._loop_watch = asyncio.create_task(self._watch_loop(interval))
+
+    async def stop_loop_watch(self):
+        if self._loop_watch is None:
+            return
+        self._loop_watch.cancel()
+        try:
+            await self._loop_watch
+        except asyncio.CancelledError:
+            pass
+        self._loop_watch = None
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request into ``metrics``.
+
+    Requests are labelled with the template of the route that served them
+    (``/api/habits/{habit_id}``), or "unmatched", so ids never become label
+    values.
+    """
+
+    def __init__(self, app, metrics: Instrumentation):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500  # if the app raises before responding
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestMetrics()
+        token = request_metrics.set(stats)
+        self.metrics.in_flight.inc()
+        began = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - began
+            self.metrics.in_flight.dec()
+            request_metrics.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.metrics.observe_request(scope["method"], route, status, elapsed, stats)
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Raised when too many hash/verify calls are already queued."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool instead of the event loop.
+
+    bcrypt releases the GIL while hashing, so ``max_concurrency`` worker
+    threads hash in parallel while the loop keeps serving other requests.
+    At most ``max_pending`` calls may be running or waiting for a worker;
+    beyond that ``HasherBusy`` is raised so a login burst is shed instead of
+    building an unbounded queue.
+    """
+
+    def __init__(self, rounds: int = 12, max_concurrency: int = 2, max_pending: int = 64):
+        self.rounds = rounds
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="bcrypt")
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HasherBusy(f"{self.pending} password hashes already queued")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when a stored hash was made with a different cost than ``rounds``."""
+        # bcrypt hashes look like $2b$12$<salt+digest>
+        try:
+            return int(hashed_password.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            logger.warning("Unrecognised password hash format")
+            return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
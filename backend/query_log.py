@@ -0,0 +1,193 @@
+import logging
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from metrics import STATEMENT_CALLS, RequestMetrics, request_metrics
+
+logger = logging.getLogger(__name__)
+
+STATEMENTS_HEADER = "X-DB-Statements"
+DB_TIME_HEADER = "X-DB-Time-Ms"
+
+FETCH_CALLS = frozenset(("fetchone", "fetchmany", "fetchall"))
+# Cursors read but never closed are logged as they stand past this many
+MAX_OPEN_STATEMENTS = 1000
+PLAN_CACHE_SIZE = 256
+LOGGED_SQL_CHARS = 1000
+
+
+def parameter_shape(params, many: bool = False) -> str:
+    """The types of bound parameters, never their values: ``(UUID, int, str)``."""
+    if many:
+        if not isinstance(params, (list, tuple)):
+            return "many"
+        return f"{len(params)} x {parameter_shape(params[0]) if params else '()'}"
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+class StatementRecord:
+    __slots__ = ("path", "sql", "params", "many", "seconds", "rows")
+
+    def __init__(self, path: Path, sql: str, params, many: bool, seconds: float):
+        self.path = path
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.seconds = seconds
+        self.rows = 0
+
+
+class QueryLog:
+    """Slow-statement and chatty-request log, fed every SQLite call by
+    ``ConnectionPool``.
+
+    A statement is timed together with the fetches from its cursor, until
+    the cursor is closed (right away for statements returning no rows). One
+    that took ``slow_seconds`` or longer is logged with its SQL, the types
+    of its parameters, the rows it returned or changed and its EXPLAIN QUERY
+    PLAN, which is taken on a separate read-only connection and cached per
+    SQL text. A request that ran more than ``max_statements`` statements is
+    logged with the statement it repeated most, the usual sign of a query
+    run once per item in a loop.
+    """
+
+    def __init__(self, slow_seconds: float, max_statements: int, debug_headers: bool = False):
+        self.slow_seconds = slow_seconds
+        self.max_statements = max_statements
+        self.debug_headers = debug_headers
+        self._open: "OrderedDict[sqlite3.Cursor, StatementRecord]" = OrderedDict()
+        self._plans: "OrderedDict[str, str]" = OrderedDict()
+        self._explainers: Dict[Path, sqlite3.Connection] = {}
+        self.slow_statements = 0
+        self.chatty_requests = 0
+
+    def observe(self, db, fn, args: tuple, result, seconds: float):
+        name = fn.__name__
+        if name in STATEMENT_CALLS:
+            sql = args[0]
+            stats = request_metrics.get()
+            if stats is not None:
+                stats.by_sql[sql] = stats.by_sql.get(sql, 0) + 1
+            record = StatementRecord(db.path, sql, args[1] if len(args) > 1 else None, name == "executemany", seconds)
+            if isinstance(result, sqlite3.Cursor) and result.description is not None:
+                # Its rows are still to be fetched
+                previous = self._open.pop(result, None)
+                if previous is not None:
+                    self._finish(previous)
+                self._open[result] = record
+                if len(self._open) > MAX_OPEN_STATEMENTS:
+                    self._finish(self._open.popitem(last=False)[1])
+                return
+            if isinstance(result, list):
+                record.rows = len(result)
+            elif isinstance(result, sqlite3.Cursor):
+                record.rows = max(result.rowcount, 0)
+            self._finish(record)
+        elif name in FETCH_CALLS:
+            record = self._open.get(getattr(fn, "__self__", None))
+            if record is not None:
+                record.seconds += seconds
+                record.rows += len(result) if isinstance(result, list) else int(result is not None)
+        elif name == "close":
+            record = self._open.pop(getattr(fn, "__self__", None), None)
+            if record is not None:
+                record.seconds += seconds
+                self._finish(record)
+
+    def _finish(self, record: StatementRecord):
+        if record.seconds < self.slow_seconds:
+            return
+        self.slow_statements += 1
+        sql = " ".join(record.sql.split())
+        if len(sql) > LOGGED_SQL_CHARS:
+            sql = sql[:LOGGED_SQL_CHARS] + "..."
+        logger.warning(
+            "Slow query: %.1f ms, %d rows, params %s\n    %s\n%s",
+            record.seconds * 1000, record.rows, parameter_shape(record.params, record.many), sql, self._plan(record),
+        )
+
+    def _plan(self, record: StatementRecord) -> str:
+        plan = self._plans.get(record.sql)
+        if plan is not None:
+            self._plans.move_to_end(record.sql)
+            return plan
+
+        params = record.params
+        if record.many:
+            params = params[0] if isinstance(params, (list, tuple)) and params else None
+        try:
+            conn = self._explainers.get(record.path)
+            if conn is None:
+                uri = Path(record.path).resolve().as_uri() + "?mode=ro"
+                conn = self._explainers[record.path] = sqlite3.connect(uri, uri=True)
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {record.sql}", params or ()).fetchall()
+        except (sqlite3.Error, ValueError) as e:
+            # e.g. several statements, or tables only the original connection sees
+            return f"    (no query plan: {e})"
+
+        depth = {0: 0}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append("    " * depth[node] + detail)
+        plan = "\n".join(lines) or "    (no query plan)"
+        self._plans[record.sql] = plan
+        while len(self._plans) > PLAN_CACHE_SIZE:
+            self._plans.popitem(last=False)
+        return plan
+
+    def check_request(self, method: str, route: str, stats: RequestMetrics):
+        if stats.statements <= self.max_statements:
+            return
+        self.chatty_requests += 1
+        sql, count = max(stats.by_sql.items(), key=lambda item: item[1], default=("", 0))
+        logger.warning(
+            "%s %s ran %d statements (%.1f ms in SQLite); most repeated, %d times: %s",
+            method, route, stats.statements, stats.db_seconds * 1000, count, " ".join(sql.split())[:LOGGED_SQL_CHARS],
+        )
+
+    def close(self):
+        for conn in self._explainers.values():
+            conn.close()
+        self._explainers = {}
+
+
+class QueryLogMiddleware:
+    """ASGI middleware that flags requests running too many statements and,
+    with ``query_log.debug_headers``, reports the statements run and time
+    spent in SQLite so far in response headers.
+
+    Reads the request's ``RequestMetrics``, so it must sit inside
+    ``MetricsMiddleware``. A streamed response's headers only count the work
+    done before its first chunk.
+    """
+
+    def __init__(self, app, query_log: QueryLog):
+        self.app = app
+        self.query_log = query_log
+
+    async def __call__(self, scope, receive, send):
+        stats: Optional[RequestMetrics] = request_metrics.get() if scope["type"] == "http" else None
+        if stats is None:
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and self.query_log.debug_headers:
+                headers = MutableHeaders(scope=message)
+                headers.append(STATEMENTS_HEADER, str(stats.statements))
+                headers.append(DB_TIME_HEADER, f"{stats.db_seconds * 1000:.3f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self.query_log.check_request(scope["method"], route, stats)
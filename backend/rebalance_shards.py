@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Move users between shard files after DB_SHARD_COUNT changes.
+
+Run with the server stopped, from the backend directory and with the same
+DB_PATH the server uses:
+
+    python rebalance_shards.py --from-count 1 --to-count 4
+
+Every user whose shard is different under the new count is copied to the new
+shard and then deleted from the old one. The copy goes through the target's
+triggers, so its daily rollups and search documents are rebuilt there; the
+user's sync sequence and each row's change_seq are carried over so clients
+keep syncing incrementally. A user is copied in one transaction and removed
+in a second, so an interrupted run leaves at worst a duplicate that the next
+run (with the same arguments) cleans up. When shrinking, the files of the
+removed shards are left empty for you to delete.
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import sys
+import uuid
+from pathlib import Path
+
+import server
+from shards import shard_index, shard_paths
+
+# Tables holding a user's records, parents first
+USER_TABLES = ("habits", "habit_logs", "mood_entries", "focus_sessions")
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def copy_user(conn, user_id: bytes):
+    """Copy one user from ``main`` to ``target`` in a single transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = ", ".join(table_columns(conn, "users"))
+        conn.execute(
+            f"INSERT INTO target.users ({columns}) SELECT {columns} FROM main.users WHERE id = ? "
+            f"ON CONFLICT DO NOTHING",
+            (user_id,)
+        )
+        for table in USER_TABLES:
+            columns = ", ".join(table_columns(conn, table))
+            conn.execute(
+                f"INSERT INTO target.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE user_id = ? "
+                f"ON CONFLICT DO NOTHING",
+                (user_id,)
+            )
+            # The sync triggers stamped the copies with new sequence values
+            conn.execute(
+                f"UPDATE target.{table} AS moved SET change_seq = source.change_seq "
+                f"FROM main.{table} AS source WHERE moved.id = source.id AND moved.user_id = ?",
+                (user_id,)
+            )
+        conn.execute(
+            "INSERT INTO target.sync_sequences (user_id, seq) SELECT user_id, seq FROM main.sync_sequences "
+            "WHERE user_id = ? ON CONFLICT (user_id) DO UPDATE SET seq = MAX(seq, excluded.seq)",
+            (user_id,)
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def delete_user(conn, user_id: bytes):
+    """Remove one user's rows from ``main`` once they are safely in ``target``."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in reversed(USER_TABLES):
+            conn.execute(f"DELETE FROM main.{table} WHERE user_id = ?", (user_id,))
+        for table in ("daily_rollups", "sync_sequences"):
+            conn.execute(f"DELETE FROM main.{table} WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM main.users WHERE id = ?", (user_id,))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+async def init_shards(paths):
+    for path in paths:
+        pool = server.open_shard(path).pool
+        await pool.open()
+        try:
+            await server.init_db(pool)
+        finally:
+            await pool.close()
+
+
+def rebalance(db_path: Path, from_count: int, to_count: int) -> int:
+    """Move every misplaced user; returns how many were moved."""
+    sources = [path for path in shard_paths(db_path, from_count) if path.exists()]
+    targets = shard_paths(db_path, to_count)
+    asyncio.run(init_shards(dict.fromkeys(sources + targets)))
+
+    moved = 0
+    for source in sources:
+        conn = sqlite3.connect(source, isolation_level=None)
+        try:
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+            for user_id in user_ids:
+                target = targets[shard_index(uuid.UUID(bytes=user_id), to_count)]
+                if target == source:
+                    continue
+                conn.execute("ATTACH DATABASE ? AS target", (str(target),))
+                try:
+                    copy_user(conn, user_id)
+                finally:
+                    conn.execute("DETACH DATABASE target")
+                delete_user(conn, user_id)
+                moved += 1
+        finally:
+            conn.close()
+        print(f"{source.name}: {len(user_ids)} users checked")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-count", type=int, required=True, help="shard count the data was written with")
+    parser.add_argument("--to-count", type=int, required=True, help="new DB_SHARD_COUNT")
+    args = parser.parse_args()
+    if args.from_count < 1 or args.to_count < 1:
+        parser.error("shard counts must be at least 1")
+
+    moved = rebalance(server.DB_PATH, args.from_count, args.to_count)
+    print(f"Moved {moved} users to their shard among {args.to_count}")
+    drained = shard_paths(server.DB_PATH, args.from_count)[args.to_count:]
+    if drained:
+        print("No longer used, safe to delete: " + ", ".join(str(path) for path in drained))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
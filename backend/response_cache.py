@@ -0,0 +1,77 @@
+import hashlib
+import itertools
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class VersionedResponseCache:
+    """Per-user cache of serialized responses, invalidated by a version counter.
+
+    Every write for a user calls ``bump``; ETags carry the version they were
+    built at, so a bump makes every ETag handed out before it stale and drops
+    the user's cached body. Versions are drawn from one
+    process-wide counter and ETags include a per-process boot id, so neither
+    evicting a user nor restarting the server can reissue an old ETag for
+    different data.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._counter = itertools.count(1)
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._bodies: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def version(self, user_id: str) -> int:
+        version = self._versions.get(user_id)
+        if version is None:
+            version = self._versions[user_id] = next(self._counter)
+            if len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+        else:
+            self._versions.move_to_end(user_id)
+        return version
+
+    def bump(self, user_id: str):
+        self._versions[user_id] = next(self._counter)
+        self._versions.move_to_end(user_id)
+        self._bodies.pop(user_id, None)
+
+    def etag(self, user_id: str, variant: str = "") -> str:
+        digest = hashlib.blake2s(f"{user_id}|{variant}".encode('utf-8'), digest_size=6).hexdigest()
+        return f'W/"{self._boot_id}.{self.version(user_id)}.{digest}"'
+
+    def get(self, user_id: str, etag: str) -> Optional[bytes]:
+        entry = self._bodies.get(user_id)
+        if entry is None or entry[0] != etag:
+            self.misses += 1
+            return None
+        self._bodies.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: str, etag: str, body: bytes):
+        self._bodies[user_id] = (etag, body)
+        self._bodies.move_to_end(user_id)
+        while len(self._bodies) > self.max_entries:
+            self._bodies.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._bodies), "hits": self.hits, "misses": self.misses}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in candidates)
@@ -1,30 +1,158 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-import aiosqlite
 import os
+import asyncio
+import csv
+import io
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import Dict, List, NamedTuple, Optional
 import uuid
-from datetime import datetime, timedelta
-import bcrypt
+import base64
+import json
+import re
+from datetime import date, datetime, timedelta
+import sqlite3
 import jwt
-from collections import defaultdict
+import orjson
+
+import analytics
+from admission import AdmissionController, AdmissionMiddleware, TokenBuckets
+from auth_cache import UserCache
+from db_pool import ConnectionPool, PoolTimeout
+from fast_json import RowEncoder, json_response
+from hot_tier import HotTier
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Instrumentation, MetricsMiddleware
+from password_hashing import HasherBusy, PasswordHasher
+from query_log import DB_TIME_HEADER, STATEMENTS_HEADER, QueryLog, QueryLogMiddleware
+import storage_codecs
+from response_cache import VersionedResponseCache, etag_matches
+from shards import Shard, ShardRouter, shard_paths
+from stream_parsing import csv_records, ndjson_records
+from write_queue import GroupCommitWriter, WriteQueueFull
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # SQLite Database path
-DB_PATH = ROOT_DIR / 'pulse_app.db'
+DB_PATH = Path(os.environ.get('DB_PATH', ROOT_DIR / 'pulse_app.db'))
+
+# Number of database files users are hash-partitioned across. Shard 0 is
+# DB_PATH itself; run rebalance_shards.py (server stopped) after changing it.
+DB_SHARD_COUNT = int(os.environ.get('DB_SHARD_COUNT', '1'))
+
+# SQLite connection pool, one per shard
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KIB = int(os.environ.get('DB_CACHE_SIZE_KIB', '8192'))
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_ACQUIRE_TIMEOUT = float(os.environ.get('DB_ACQUIRE_TIMEOUT', '10'))
+
+# Group-commit writer for habit log, mood and focus writes, one per shard
+WRITE_BATCH_MAX_SIZE = int(os.environ.get('WRITE_BATCH_MAX_SIZE', '64'))
+WRITE_BATCH_MAX_DELAY_MS = float(os.environ.get('WRITE_BATCH_MAX_DELAY_MS', '2'))
+WRITE_QUEUE_MAX_DEPTH = int(os.environ.get('WRITE_QUEUE_MAX_DEPTH', '1000'))
+
+# In-memory hot tier: the last HOT_TIER_DAYS days of habit logs and mood
+# entries of up to HOT_TIER_MAX_USERS active users, served from memory and
+# written behind through the group-commit writer. 0 days turns it off.
+HOT_TIER_DAYS = int(os.environ.get('HOT_TIER_DAYS', '0'))
+HOT_TIER_MAX_USERS = int(os.environ.get('HOT_TIER_MAX_USERS', '10000'))
+
+# Seconds between event-loop lag probes reported on /metrics
+METRICS_LOOP_LAG_INTERVAL = float(os.environ.get('METRICS_LOOP_LAG_INTERVAL', '0.5'))
+
+# Slow-query log: statements taking SLOW_QUERY_MS or longer are logged with
+# their query plan, requests running more than MAX_STATEMENTS_PER_REQUEST
+# statements are logged as likely N+1 loops
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+MAX_STATEMENTS_PER_REQUEST = int(os.environ.get('MAX_STATEMENTS_PER_REQUEST', '50'))
+
+# Debug mode: every response reports the statements it ran and its time in SQLite
+DEBUG = os.environ.get('DEBUG', '0') == '1'
+
+# Admission control: each signed-in user may make RATE_LIMIT_PER_SECOND
+# requests a second, RATE_LIMIT_BURST at once (0 per second turns rate
+# limiting off), and each endpoint class serves at most MAX_CONCURRENT_<CLASS>
+# requests at once. Excess requests get 429 / 503 with Retry-After.
+RATE_LIMIT_PER_SECOND = float(os.environ.get('RATE_LIMIT_PER_SECOND', '20'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '100'))
+RATE_LIMIT_MAX_USERS = int(os.environ.get('RATE_LIMIT_MAX_USERS', '100000'))
+MAX_CONCURRENT_AUTH = int(os.environ.get('MAX_CONCURRENT_AUTH', '32'))
+MAX_CONCURRENT_READS = int(os.environ.get('MAX_CONCURRENT_READS', '64'))
+MAX_CONCURRENT_WRITES = int(os.environ.get('MAX_CONCURRENT_WRITES', '128'))
+MAX_CONCURRENT_ANALYTICS = int(os.environ.get('MAX_CONCURRENT_ANALYTICS', '16'))
 
 # JWT Configuration
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Verified token -> user row cache used by get_current_user
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000'))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get('AUTH_CACHE_TTL_SECONDS', '300'))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_MAX_CONCURRENCY = int(os.environ.get('BCRYPT_MAX_CONCURRENCY', '2'))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', '64'))
+
+# Serialized /analytics responses kept per user
+ANALYTICS_CACHE_MAX_USERS = int(os.environ.get('ANALYTICS_CACHE_MAX_USERS', '10000'))
+# Longest ?from=&to= range /analytics will aggregate
+ANALYTICS_MAX_WINDOW_DAYS = int(os.environ.get('ANALYTICS_MAX_WINDOW_DAYS', '366'))
+
+# Offline-sync batch uploads
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '500'))
+
+# List endpoint pagination
+DEFAULT_PAGE_LIMIT = int(os.environ.get('DEFAULT_PAGE_LIMIT', '100'))
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT', '1000'))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+# Tables served by GET /sync, with the columns whose changes bump change_seq
+SYNC_TABLES = {
+    "habits": ("user_id", "name", "description", "frequency", "color", "icon", "target_per_week"),
+    "habit_logs": ("habit_id", "user_id", "date", "completed", "notes"),
+    "mood_entries": ("user_id", "mood_level", "energy_level", "sleep_hours", "notes", "date"),
+    "focus_sessions": ("user_id", "task_name", "duration_minutes", "start_time", "end_time", "date", "completed"),
+}
+DEFAULT_SYNC_LIMIT = int(os.environ.get('DEFAULT_SYNC_LIMIT', '500'))
+
+# Streaming exports: rows fetched per chunk, and concurrent exports allowed
+# (each holds a pool connection for as long as its client takes to read)
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '500'))
+EXPORT_MAX_CONCURRENT = int(os.environ.get('EXPORT_MAX_CONCURRENT', '2'))
+
+# Bulk imports: rows validated and written per chunk, concurrent imports
+# allowed, and per-row errors kept in the progress report
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+IMPORT_MAX_CONCURRENT = int(os.environ.get('IMPORT_MAX_CONCURRENT', '2'))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '100'))
+
+# Full-text search; longer queries are truncated to the first terms
+DEFAULT_SEARCH_LIMIT = int(os.environ.get('DEFAULT_SEARCH_LIMIT', '20'))
+MAX_SEARCH_TERMS = int(os.environ.get('MAX_SEARCH_TERMS', '16'))
+
+# Records indexed for GET /search:
+# (table, kind, title, body, date, condition, columns that trigger a reindex)
+SEARCH_SOURCES = (
+    ("habits", "habit", "{row}name", "COALESCE({row}description, '')", "{row}created_at / 86400000000",
+     "1", "user_id, name, description"),
+    ("habit_logs", "habit_log", "''", "{row}notes", "{row}date",
+     "{row}notes != ''", "user_id, notes, date"),
+    ("mood_entries", "mood_entry", "''", "{row}notes", "{row}date",
+     "{row}notes != ''", "user_id, notes, date"),
+    ("focus_sessions", "focus_session", "{row}task_name", "''", "{row}date",
+     "1", "user_id, task_name, date"),
+)
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -43,7 +171,7 @@ class UserLogin(BaseModel):
     password: str
 
 class UserResponse(BaseModel):
-    id: str
+    id: uuid.UUID
     name: str
     email: str
     created_at: datetime
@@ -63,8 +191,8 @@ class HabitCreate(BaseModel):
     target_per_week: int = 7
 
 class Habit(BaseModel):
-    id: str
-    user_id: str
+    id: uuid.UUID
+    user_id: uuid.UUID
     name: str
     description: str
     frequency: str
@@ -80,10 +208,10 @@ class HabitLogCreate(BaseModel):
     notes: Optional[str] = ""
 
 class HabitLog(BaseModel):
-    id: str
-    habit_id: str
-    user_id: str
-    date: str
+    id: uuid.UUID
+    habit_id: uuid.UUID
+    user_id: uuid.UUID
+    date: date
     completed: bool
     notes: str
     timestamp: datetime
@@ -97,13 +225,13 @@ class MoodEntryCreate(BaseModel):
     date: str
 
 class MoodEntry(BaseModel):
-    id: str
-    user_id: str
+    id: uuid.UUID
+    user_id: uuid.UUID
     mood_level: int
     energy_level: int
     sleep_hours: float
     notes: str
-    date: str
+    date: date
     timestamp: datetime
 
 # Focus Models
@@ -114,13 +242,13 @@ class FocusSessionCreate(BaseModel):
     completed: bool = True
 
 class FocusSession(BaseModel):
-    id: str
-    user_id: str
+    id: uuid.UUID
+    user_id: uuid.UUID
     task_name: str
     duration_minutes: int
     start_time: datetime
     end_time: datetime
-    date: str
+    date: date
     completed: bool
 
 # Analytics Models
@@ -146,100 +274,725 @@ class AnalyticsResponse(BaseModel):
     mood_chart_data: List[dict]
     focus_chart_data: List[dict]
 
+# Batch Models
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "created", "updated" or "error"
+    id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+# Sync Models
+class SyncResponse(BaseModel):
+    cursor: int
+    has_more: bool
+    habits: List[Habit]
+    habit_logs: List[HabitLog]
+    mood_entries: List[MoodEntry]
+    focus_sessions: List[FocusSession]
+
+# Search Models
+class SearchResult(BaseModel):
+    kind: str  # "habit", "habit_log", "mood_entry" or "focus_session"
+    id: uuid.UUID
+    date: Optional[date]
+    title: str
+    snippet: str
+    score: float
+
+# Import Models: the create models plus the fields an export carries
+class HabitImport(HabitCreate):
+    id: Optional[uuid.UUID] = None
+    created_at: Optional[datetime] = None
+
+class HabitLogImport(HabitLogCreate):
+    habit_id: uuid.UUID
+    timestamp: Optional[datetime] = None
+
+class MoodEntryImport(MoodEntryCreate):
+    timestamp: Optional[datetime] = None
+
+class FocusSessionImport(FocusSessionCreate):
+    id: Optional[uuid.UUID] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportProgress(BaseModel):
+    state: str  # "running", "completed" or "failed"
+    rows_read: int = 0
+    rows_imported: int = 0
+    rows_failed: int = 0
+    errors: List[ImportRowError] = []
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+
 # ========== DATABASE HELPERS ==========
 
-async def get_db():
-    db = await aiosqlite.connect(DB_PATH)
-    db.row_factory = aiosqlite.Row
-    return db
+storage_codecs.register()
+
+instrumentation = Instrumentation(namespace="pulse")
+query_log = QueryLog(SLOW_QUERY_MS / 1000, MAX_STATEMENTS_PER_REQUEST, debug_headers=DEBUG)
+
+def observe_db_call(db, fn, args, result, seconds):
+    instrumentation.observe_db_call(db, fn, args, result, seconds)
+    query_log.observe(db, fn, args, result, seconds)
+
+def open_shard(path: Path) -> Shard:
+    pool = ConnectionPool(
+        path,
+        size=DB_POOL_SIZE,
+        busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+        cache_size_kib=DB_CACHE_SIZE_KIB,
+        mmap_size=DB_MMAP_SIZE,
+        acquire_timeout=DB_ACQUIRE_TIMEOUT,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        observer=observe_db_call,
+    )
+    writer = GroupCommitWriter(
+        pool,
+        max_batch=WRITE_BATCH_MAX_SIZE,
+        max_delay_ms=WRITE_BATCH_MAX_DELAY_MS,
+        max_depth=WRITE_QUEUE_MAX_DEPTH,
+    )
+    return Shard(pool, writer)
 
-async def init_db():
-    db = await get_db()
+shards = ShardRouter([open_shard(path) for path in shard_paths(DB_PATH, DB_SHARD_COUNT)])
+
+class TokenSubject(NamedTuple):
+    user_id: uuid.UUID
+    user: Optional[dict]  # the cached user row, if the token was cached
+    expires: float
+
+async def get_token_subject(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenSubject:
+    """The user a bearer token was issued to, without touching the database.
+
+    Which shard a request's connection comes from depends on the user, so
+    the token is checked before ``get_db`` opens one.
+    """
+    token = credentials.credentials
+    user = user_cache.get(token)
+    if user is not None:
+        return TokenSubject(user["id"], user, 0)
     
-    # Users table
-    await db.execute("""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = storage_codecs.parse_uuid(payload.get("sub"))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return TokenSubject(user_id, None, payload.get("exp", float("inf")))
+
+def token_subject_id(token: str) -> Optional[str]:
+    """The ``sub`` of a valid bearer token, for admission control. Tokens in
+    the user cache are already verified, so only a miss pays for jwt.decode."""
+    user = user_cache.get(token)
+    if user is not None:
+        return str(user["id"])
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.InvalidTokenError:
+        return None
+
+@asynccontextmanager
+async def user_transaction(user_id: uuid.UUID):
+    """A transaction on the user's shard that sees all of their writes so far,
+    including those the hot tier has not committed yet."""
+    if hot_tier is not None:
+        await hot_tier.settle(user_id)
+    async with shards.pool(user_id).transaction() as db:
+        yield db
+
+async def get_db(subject: TokenSubject = Depends(get_token_subject)):
+    """Request-scoped unit of work on the current user's shard.
+
+    FastAPI caches dependencies per request, so ``get_current_user`` and the
+    endpoint share this connection and the transaction it commits on success.
+    """
+    async with user_transaction(subject.user_id) as db:
+        yield db
+
+# Base tables, in creation order. Ids are stored as 16-byte UUIDs, dates as
+# day numbers and timestamps as microseconds (see storage_codecs).
+TABLE_SCHEMAS = {
+    "users": """
         CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
+            id UUID BLOB PRIMARY KEY,
             name TEXT NOT NULL,
             email TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP INTEGER DEFAULT (unixepoch() * 1000000)
         )
-    """)
-    
-    # Habits table
-    await db.execute("""
+    """,
+    "habits": """
         CREATE TABLE IF NOT EXISTS habits (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
+            id UUID BLOB PRIMARY KEY,
+            user_id UUID BLOB NOT NULL,
             name TEXT NOT NULL,
             description TEXT,
             frequency TEXT DEFAULT 'daily',
             color TEXT DEFAULT '#3f8cff',
             icon TEXT DEFAULT 'checkmark-circle',
             target_per_week INTEGER DEFAULT 7,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP INTEGER DEFAULT (unixepoch() * 1000000),
+            change_seq INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
-    """)
-    
-    # Habit logs table
-    await db.execute("""
+    """,
+    "habit_logs": """
         CREATE TABLE IF NOT EXISTS habit_logs (
-            id TEXT PRIMARY KEY,
-            habit_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            date TEXT NOT NULL,
+            id UUID BLOB PRIMARY KEY,
+            habit_id UUID BLOB NOT NULL,
+            user_id UUID BLOB NOT NULL,
+            date DAY INTEGER NOT NULL,
             completed BOOLEAN DEFAULT 0,
             notes TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            timestamp TIMESTAMP INTEGER DEFAULT (unixepoch() * 1000000),
+            change_seq INTEGER NOT NULL DEFAULT 0,
             UNIQUE(habit_id, date),
             FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
-    """)
-    
-    # Mood entries table
-    await db.execute("""
+    """,
+    "mood_entries": """
         CREATE TABLE IF NOT EXISTS mood_entries (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
+            id UUID BLOB PRIMARY KEY,
+            user_id UUID BLOB NOT NULL,
             mood_level INTEGER NOT NULL,
             energy_level INTEGER NOT NULL,
             sleep_hours REAL NOT NULL,
             notes TEXT,
-            date TEXT NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            date DAY INTEGER NOT NULL,
+            timestamp TIMESTAMP INTEGER DEFAULT (unixepoch() * 1000000),
+            change_seq INTEGER NOT NULL DEFAULT 0,
             UNIQUE(user_id, date),
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
-    """)
-    
-    # Focus sessions table
-    await db.execute("""
+    """,
+    "focus_sessions": """
         CREATE TABLE IF NOT EXISTS focus_sessions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
+            id UUID BLOB PRIMARY KEY,
+            user_id UUID BLOB NOT NULL,
             task_name TEXT NOT NULL,
             duration_minutes INTEGER NOT NULL,
-            start_time TIMESTAMP NOT NULL,
-            end_time TIMESTAMP NOT NULL,
-            date TEXT NOT NULL,
+            start_time TIMESTAMP INTEGER NOT NULL,
+            end_time TIMESTAMP INTEGER NOT NULL,
+            date DAY INTEGER NOT NULL,
             completed BOOLEAN DEFAULT 1,
+            change_seq INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
         )
-    """)
+    """,
+    # Delta sync: every insert or update of a user's records takes the
+    # next value of that user's change sequence
+    "sync_sequences": """
+        CREATE TABLE IF NOT EXISTS sync_sequences (
+            user_id UUID BLOB PRIMARY KEY,
+            seq INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """,
+}
+
+# SQL conversion from the text columns of databases created before the
+# compact encoding, by declared column type
+LEGACY_CONVERSIONS = {
+    "UUID": ("legacy_uuid", storage_codecs.legacy_uuid),
+    "DAY": ("legacy_day", storage_codecs.legacy_day),
+    "TIMESTAMP": ("legacy_micros", storage_codecs.legacy_micros),
+}
+
+async def migrate_legacy_storage(db, path: Path):
+    """Rewrite a database that still stores ids, dates and timestamps as text.
+
+    Runs in one transaction: the base tables are renamed, recreated with the
+    compact schema and copied over with each column converted. Triggers and
+    the derived tables (daily rollups, search) are dropped; init_db
+    recreates and backfills them. Ids that were not UUIDs are mapped to
+    stable name-based UUIDs, and rows whose date cannot be parsed are
+    dropped and counted in the log. The file keeps the freed pages until
+    the next VACUUM.
+    """
+    async with db.execute("PRAGMA table_info(users)") as cursor:
+        id_types = [row["type"] for row in await cursor.fetchall() if row["name"] == "id"]
+    if id_types != ["TEXT"]:
+        return
     
-    await db.commit()
-    await db.close()
+    logger.info("Migrating %s to the compact storage encoding", path)
+    for name, function in LEGACY_CONVERSIONS.values():
+        await db.create_function(name, 1, function, deterministic=True)
+    
+    await db.execute("BEGIN IMMEDIATE")
+    try:
+        async with db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'") as cursor:
+            triggers = [row["name"] for row in await cursor.fetchall()]
+        for trigger in triggers:
+            await db.execute(f"DROP TRIGGER {trigger}")
+        for table in ("search_index", "search_documents", "daily_rollups"):
+            await db.execute(f"DROP TABLE IF EXISTS {table}")
+        
+        for table, schema in TABLE_SCHEMAS.items():
+            async with db.execute(f"PRAGMA table_info({table})") as cursor:
+                legacy_columns = {row["name"] for row in await cursor.fetchall()}
+            if not legacy_columns:
+                await db.execute(schema)
+                continue
+            await db.execute(f"ALTER TABLE {table} RENAME TO legacy_{table}")
+            await db.execute(schema)
+            async with db.execute(f"PRAGMA table_info({table})") as cursor:
+                columns = [(row["name"], row["type"].split()[0]) for row in await cursor.fetchall()
+                           if row["name"] in legacy_columns]
+            values = [
+                f"{LEGACY_CONVERSIONS[kind][0]}({name})" if kind in LEGACY_CONVERSIONS else name
+                for name, kind in columns
+            ]
+            # OR IGNORE skips rows a conversion turned into NULL for a NOT NULL column
+            await db.execute(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(name for name, _ in columns)}) "
+                f"SELECT {', '.join(values)} FROM legacy_{table}"
+            )
+            async with db.execute(
+                f"SELECT (SELECT COUNT(*) FROM legacy_{table}) - (SELECT COUNT(*) FROM {table}) AS dropped"
+            ) as cursor:
+                dropped = (await cursor.fetchone())["dropped"]
+            if dropped:
+                logger.warning("Dropped %d unconvertible rows from %s", dropped, table)
+            await db.execute(f"DROP TABLE legacy_{table}")
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+
+async def init_db(pool: ConnectionPool):
+    """Create or upgrade the schema of one shard's database file."""
+    async with pool.connection() as db:
+        await migrate_legacy_storage(db, pool.path)
+        for schema in TABLE_SCHEMAS.values():
+            await db.execute(schema)
+    
+        # Daily rollups: one row per user per day, kept current by the
+        # triggers below in the same transaction as the write itself
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_rollups'"
+        ) as cursor:
+            rollups_exist = await cursor.fetchone() is not None
+        
+        await db.executescript("""
+            CREATE TABLE IF NOT EXISTS daily_rollups (
+                user_id UUID BLOB NOT NULL,
+                date DAY INTEGER NOT NULL,
+                habits_completed INTEGER NOT NULL DEFAULT 0,
+                focus_minutes INTEGER NOT NULL DEFAULT 0,
+                focus_sessions INTEGER NOT NULL DEFAULT 0,
+                mood_level INTEGER,
+                energy_level INTEGER,
+                sleep_hours REAL,
+                PRIMARY KEY (user_id, date)
+            ) WITHOUT ROWID;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_habit_logs_rollup_insert
+            AFTER INSERT ON habit_logs WHEN NEW.completed
+            BEGIN
+                INSERT INTO daily_rollups (user_id, date, habits_completed) VALUES (NEW.user_id, NEW.date, 1)
+                ON CONFLICT (user_id, date) DO UPDATE SET habits_completed = habits_completed + 1;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_habit_logs_rollup_update
+            AFTER UPDATE OF completed, user_id, date ON habit_logs
+            BEGIN
+                UPDATE daily_rollups SET habits_completed = habits_completed - 1
+                WHERE OLD.completed AND user_id = OLD.user_id AND date = OLD.date;
+                INSERT INTO daily_rollups (user_id, date, habits_completed)
+                SELECT NEW.user_id, NEW.date, 1 WHERE NEW.completed
+                ON CONFLICT (user_id, date) DO UPDATE SET habits_completed = habits_completed + 1;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_habit_logs_rollup_delete
+            AFTER DELETE ON habit_logs WHEN OLD.completed
+            BEGIN
+                UPDATE daily_rollups SET habits_completed = habits_completed - 1
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_mood_entries_rollup_insert
+            AFTER INSERT ON mood_entries
+            BEGIN
+                INSERT INTO daily_rollups (user_id, date, mood_level, energy_level, sleep_hours)
+                VALUES (NEW.user_id, NEW.date, NEW.mood_level, NEW.energy_level, NEW.sleep_hours)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    mood_level = excluded.mood_level,
+                    energy_level = excluded.energy_level,
+                    sleep_hours = excluded.sleep_hours;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_mood_entries_rollup_update
+            AFTER UPDATE OF mood_level, energy_level, sleep_hours, user_id, date ON mood_entries
+            BEGIN
+                UPDATE daily_rollups SET mood_level = NULL, energy_level = NULL, sleep_hours = NULL
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+                INSERT INTO daily_rollups (user_id, date, mood_level, energy_level, sleep_hours)
+                VALUES (NEW.user_id, NEW.date, NEW.mood_level, NEW.energy_level, NEW.sleep_hours)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    mood_level = excluded.mood_level,
+                    energy_level = excluded.energy_level,
+                    sleep_hours = excluded.sleep_hours;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_mood_entries_rollup_delete
+            AFTER DELETE ON mood_entries
+            BEGIN
+                UPDATE daily_rollups SET mood_level = NULL, energy_level = NULL, sleep_hours = NULL
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_focus_sessions_rollup_insert
+            AFTER INSERT ON focus_sessions
+            BEGIN
+                INSERT INTO daily_rollups (user_id, date, focus_minutes, focus_sessions)
+                VALUES (NEW.user_id, NEW.date, NEW.duration_minutes, 1)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    focus_minutes = focus_minutes + excluded.focus_minutes,
+                    focus_sessions = focus_sessions + 1;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_focus_sessions_rollup_update
+            AFTER UPDATE OF duration_minutes, user_id, date ON focus_sessions
+            BEGIN
+                UPDATE daily_rollups SET
+                    focus_minutes = focus_minutes - OLD.duration_minutes,
+                    focus_sessions = focus_sessions - 1
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+                INSERT INTO daily_rollups (user_id, date, focus_minutes, focus_sessions)
+                VALUES (NEW.user_id, NEW.date, NEW.duration_minutes, 1)
+                ON CONFLICT (user_id, date) DO UPDATE SET
+                    focus_minutes = focus_minutes + excluded.focus_minutes,
+                    focus_sessions = focus_sessions + 1;
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_focus_sessions_rollup_delete
+            AFTER DELETE ON focus_sessions
+            BEGIN
+                UPDATE daily_rollups SET
+                    focus_minutes = focus_minutes - OLD.duration_minutes,
+                    focus_sessions = focus_sessions - 1
+                WHERE user_id = OLD.user_id AND date = OLD.date;
+            END;
+        """)
+        
+        if not rollups_exist:
+            # Backfill from history written before the rollup table existed
+            await db.execute("""
+                INSERT INTO daily_rollups (user_id, date, habits_completed, focus_minutes, focus_sessions,
+                                           mood_level, energy_level, sleep_hours)
+                SELECT user_id, date, SUM(habits_completed), SUM(focus_minutes), SUM(focus_sessions),
+                       MAX(mood_level), MAX(energy_level), MAX(sleep_hours)
+                FROM (
+                    SELECT user_id, date, COUNT(*) AS habits_completed, 0 AS focus_minutes, 0 AS focus_sessions,
+                           NULL AS mood_level, NULL AS energy_level, NULL AS sleep_hours
+                    FROM habit_logs WHERE completed GROUP BY user_id, date
+                    UNION ALL
+                    SELECT user_id, date, 0, SUM(duration_minutes), COUNT(*), NULL, NULL, NULL
+                    FROM focus_sessions GROUP BY user_id, date
+                    UNION ALL
+                    SELECT user_id, date, 0, 0, 0, mood_level, energy_level, sleep_hours
+                    FROM mood_entries
+                )
+                GROUP BY user_id, date
+            """)
+        
+        # Delta sync: the triggers stamp each written row with the user's next
+        # sequence value. Rows written before they existed (migrated or bulk
+        # loaded) still have change_seq 0; they are numbered after the user's
+        # current sequence so that /sync can page through them like any other.
+        for table, columns in SYNC_TABLES.items():
+            async with db.execute(f"""
+                UPDATE {table} SET change_seq = numbered.seq
+                FROM (
+                    SELECT t.rowid AS row_id,
+                           COALESCE(s.seq, 0) + ROW_NUMBER() OVER (PARTITION BY t.user_id ORDER BY t.rowid) AS seq
+                    FROM {table} t LEFT JOIN sync_sequences s ON s.user_id = t.user_id
+                    WHERE t.change_seq = 0
+                ) AS numbered
+                WHERE {table}.rowid = numbered.row_id
+            """) as cursor:
+                numbered = cursor.rowcount
+            if numbered > 0:
+                await db.execute(f"""
+                    INSERT INTO sync_sequences (user_id, seq)
+                    SELECT user_id, MAX(change_seq) FROM {table} WHERE change_seq > 0 GROUP BY user_id
+                    ON CONFLICT (user_id) DO UPDATE SET seq = MAX(seq, excluded.seq)
+                """)
+
+            await db.executescript(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_user_change_seq ON {table} (user_id, change_seq);
+                
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_insert
+                AFTER INSERT ON {table}
+                BEGIN
+                    INSERT INTO sync_sequences (user_id, seq) VALUES (NEW.user_id, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET seq = seq + 1;
+                    UPDATE {table} SET change_seq = (SELECT seq FROM sync_sequences WHERE user_id = NEW.user_id)
+                    WHERE rowid = NEW.rowid;
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_update
+                AFTER UPDATE OF {', '.join(columns)} ON {table}
+                BEGIN
+                    INSERT INTO sync_sequences (user_id, seq) VALUES (NEW.user_id, 1)
+                    ON CONFLICT (user_id) DO UPDATE SET seq = seq + 1;
+                    UPDATE {table} SET change_seq = (SELECT seq FROM sync_sequences WHERE user_id = NEW.user_id)
+                    WHERE rowid = NEW.rowid;
+                END;
+            """)
+        
+        # Full-text search: search_documents holds one row per searchable
+        # record and is the external content table of the FTS5 index. The
+        # indexed user_id column (the id in hex, as FTS5 only indexes text)
+        # lets a search match only the caller's rows.
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_documents'"
+        ) as cursor:
+            search_exists = await cursor.fetchone() is not None
+        await db.executescript("""
+            CREATE TABLE IF NOT EXISTS search_documents (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                record_id UUID BLOB NOT NULL,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                body TEXT NOT NULL,
+                date DAY INTEGER,
+                UNIQUE (kind, record_id)
+            );
+            
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                title, body, user_id,
+                content = 'search_documents', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            );
+            
+            CREATE TRIGGER IF NOT EXISTS trg_search_documents_insert
+            AFTER INSERT ON search_documents
+            BEGIN
+                INSERT INTO search_index (rowid, title, body, user_id)
+                VALUES (NEW.id, NEW.title, NEW.body, NEW.user_id);
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS trg_search_documents_delete
+            AFTER DELETE ON search_documents
+            BEGIN
+                INSERT INTO search_index (search_index, rowid, title, body, user_id)
+                VALUES ('delete', OLD.id, OLD.title, OLD.body, OLD.user_id);
+            END;
+        """)
+        for table, kind, title, body, date, condition, columns in SEARCH_SOURCES:
+            # {row} becomes "NEW." inside triggers and "" for the backfill
+            insert = (
+                "INSERT INTO search_documents (kind, record_id, user_id, title, body, date) "
+                f"SELECT '{kind}', {{row}}id, hex({{row}}user_id), {title}, {body}, {date} {{source}}WHERE {condition}"
+            )
+            await db.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_search_insert
+                AFTER INSERT ON {table}
+                BEGIN
+                    {insert.format(row="NEW.", source="")};
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_search_update
+                AFTER UPDATE OF {columns} ON {table}
+                BEGIN
+                    DELETE FROM search_documents WHERE kind = '{kind}' AND record_id = OLD.id;
+                    {insert.format(row="NEW.", source="")};
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_search_delete
+                AFTER DELETE ON {table}
+                BEGIN
+                    DELETE FROM search_documents WHERE kind = '{kind}' AND record_id = OLD.id;
+                END;
+            """)
+            if not search_exists:
+                # Backfill records written before search existed
+                await db.execute(insert.format(row="", source=f"FROM {table} "))
+        
+        # Per-user indexes; every query in this module is checked against
+        # them by tests/test_query_plans.py
+        await db.executescript("""
+            -- GET /habits, analytics habit list
+            CREATE INDEX IF NOT EXISTS idx_habits_user
+                ON habits (user_id, created_at);
+            -- GET /habits/logs paging and date ranges, analytics window
+            CREATE INDEX IF NOT EXISTS idx_habit_logs_user_date
+                ON habit_logs (user_id, date, id);
+            -- GET /habits/logs?habit_id=
+            CREATE INDEX IF NOT EXISTS idx_habit_logs_user_habit_date
+                ON habit_logs (user_id, habit_id, date, id);
+            -- GET /mood paging; UNIQUE(user_id, date) lacks the id tiebreak
+            CREATE INDEX IF NOT EXISTS idx_mood_entries_user_date
+                ON mood_entries (user_id, date, id);
+            -- GET /focus paging by start_time
+            CREATE INDEX IF NOT EXISTS idx_focus_sessions_user_start
+                ON focus_sessions (user_id, start_time, id);
+            -- analytics window; covers the per-day minutes sum
+            CREATE INDEX IF NOT EXISTS idx_focus_sessions_user_date
+                ON focus_sessions (user_id, date, duration_minutes);
+        """)
+    
+        await db.commit()
+
+# ========== PAGINATION HELPERS ==========
+
+# List endpoints encode rows directly instead of going through the models
+habit_encoder = RowEncoder(Habit)
+habit_log_encoder = RowEncoder(HabitLog)
+mood_entry_encoder = RowEncoder(MoodEntry)
+focus_session_encoder = RowEncoder(FocusSession)
+
+hot_tier = HotTier(
+    shards,
+    days=HOT_TIER_DAYS,
+    max_users=HOT_TIER_MAX_USERS,
+    log_columns=habit_log_encoder.columns,
+    mood_columns=mood_entry_encoder.columns,
+) if HOT_TIER_DAYS > 0 else None
+
+def user_data_changed(user_id: uuid.UUID):
+    """Drop what is derived from a user's habits, habit logs and mood entries;
+    call after committing a write to them that did not go through the hot tier."""
+    analytics_cache.bump(user_id)
+    if hot_tier is not None:
+        hot_tier.evict(user_id)
+
+
+sync_encoders = {
+    "habits": habit_encoder,
+    "habit_logs": habit_log_encoder,
+    "mood_entries": mood_entry_encoder,
+    "focus_sessions": focus_session_encoder,
+}
+
+# How cursor values of each key column are read back from their JSON strings
+CURSOR_PARSERS = {
+    "id": uuid.UUID,
+    "date": date.fromisoformat,
+    "start_time": datetime.fromisoformat,
+}
+
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, key_columns: tuple) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        # encode_cursor writes every value as a string
+        if (isinstance(values, list) and len(values) == len(key_columns)
+                and all(isinstance(value, str) for value in values)):
+            return [CURSOR_PARSERS[column](value) for column, value in zip(key_columns, values)]
+    except (TypeError, ValueError, UnicodeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_date_param(value: Optional[str]) -> Optional[date]:
+    """A ``from``/``to`` query value, already matched against DATE_PATTERN."""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date")
+
+async def fetch_page(db, table: str, columns: str, where: List[str], params: list, key_columns: tuple,
+                     date_from: Optional[date], date_to: Optional[date], cursor: Optional[str],
+                     limit: int, response: Response) -> list:
+    """Return one page of ``table`` ordered by ``key_columns`` descending.
+
+    Pages are addressed by keyset rather than OFFSET, so each page costs the
+    same however deep into a user's history it is. When more rows remain the
+    opaque cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    where, params = list(where), list(params)
+    if date_from:
+        where.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("date <= ?")
+        params.append(date_to)
+    if cursor:
+        where.append(f"({', '.join(key_columns)}) < ({', '.join('?' * len(key_columns))})")
+        params.extend(decode_cursor(cursor, key_columns))
+    
+    order_by = ", ".join(f"{column} DESC" for column in key_columns)
+    async with db.execute(
+        f"SELECT {columns} FROM {table} WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT ?",
+        (*params, limit + 1)
+    ) as db_cursor:
+        rows = await db_cursor.fetchall()
+    
+    return trim_page(rows, key_columns, limit, response)
+
+def trim_page(rows: list, key_columns: tuple, limit: int, response: Response) -> list:
+    """Cut up to ``limit + 1`` ordered rows down to a page, setting the cursor
+    header when there was more."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*(rows[-1][column] for column in key_columns))
+    return rows
+
+def hot_page(records, columns: tuple, date_from: date, date_to: Optional[date], limit: int,
+             response: Response) -> List[tuple]:
+    """The page fetch_page would return for ``date >= date_from``, from hot
+    tier records, as rows in ``columns`` order."""
+    records = [r for r in records if r["date"] >= date_from and (date_to is None or r["date"] <= date_to)]
+    records.sort(key=lambda r: (r["date"], r["id"]), reverse=True)
+    return [tuple(r[column] for column in columns) for r in trim_page(records[:limit + 1], ("date", "id"), limit, response)]
+
+# ========== BATCH HELPERS ==========
+
+def check_batch_size(entries: list):
+    if not entries:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} entries")
+
+def date_error(value: str) -> Optional[str]:
+    # fromisoformat is far cheaper than strptime, which matters for imports;
+    # the pattern keeps out the other ISO forms it accepts
+    try:
+        if re.match(DATE_PATTERN, value):
+            date.fromisoformat(value)
+            return None
+    except ValueError:
+        pass
+    return "date must be YYYY-MM-DD"
+
+def batch_response(results: List[BatchItemResult]) -> BatchResponse:
+    failed = sum(1 for r in results if r.status == "error")
+    return BatchResponse(succeeded=len(results) - failed, failed=failed, results=results)
 
 # ========== AUTH HELPERS ==========
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+user_cache = UserCache(max_entries=AUTH_CACHE_MAX_ENTRIES, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    max_concurrency=BCRYPT_MAX_CONCURRENCY,
+    max_pending=BCRYPT_MAX_PENDING,
+)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -247,55 +1000,82 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        db = await get_db()
-        async with db.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
-            row = await cursor.fetchone()
-            user = dict(row) if row else None
-        await db.close()
-        
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+async def load_user(db, token: str, subject: TokenSubject) -> dict:
+    async with db.execute("SELECT id, name, email, created_at FROM users WHERE id = ?", (subject.user_id,)) as cursor:
+        row = await cursor.fetchone()
+        user = dict(row) if row else None
+    
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    user_cache.put(token, user, subject.expires)
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    subject: TokenSubject = Depends(get_token_subject),
+    db = Depends(get_db),
+):
+    if subject.user is not None:
+        return subject.user
+    return await load_user(db, credentials.credentials, subject)
+
+async def get_current_user_no_db(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    subject: TokenSubject = Depends(get_token_subject),
+):
+    """``get_current_user`` for endpoints that take no request transaction.
+
+    ``get_db`` first waits for the user's hot tier writes to commit, which
+    the endpoints served from the hot tier must not do, and holds a pooled
+    connection for the whole request: endpoints that wait on the writer
+    would cap each group commit at DB_POOL_SIZE requests and starve reads.
+    """
+    if subject.user is not None:
+        return subject.user
+    async with shards.pool(subject.user_id).connection() as db:
+        return await load_user(db, credentials.credentials, subject)
+
+async def find_user_by_email(email: str) -> Optional[dict]:
+    """The user row registered with ``email``, from whichever shard holds it."""
+    for shard in shards:
+        async with shard.pool.connection() as db:
+            async with db.execute("SELECT * FROM users WHERE email = ?", (email,)) as cursor:
+                row = await cursor.fetchone()
+        if row is not None:
+            return dict(row)
+    return None
+
+# UNIQUE(email) only holds within one shard, so registrations re-check every
+# shard and insert under this lock (a single server process is assumed)
+registration_lock = asyncio.Lock()
 
 # ========== AUTH ENDPOINTS ==========
 
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(user_data: UserRegister):
-    db = await get_db()
-    
-    # Check if user exists
-    async with db.execute("SELECT * FROM users WHERE email = ?", (user_data.email,)) as cursor:
-        existing_user = await cursor.fetchone()
-    
-    if existing_user:
-        await db.close()
+    # Connections are taken only around the queries so none is held while bcrypt runs
+    if await find_user_by_email(user_data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    user_id = str(uuid.uuid4())
+    user_id = uuid.uuid4()
     created_at = datetime.utcnow()
-    await db.execute(
-        "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
-        (user_id, user_data.name, user_data.email, hash_password(user_data.password), created_at)
-    )
-    await db.commit()
-    await db.close()
+    password_hash = await hash_password(user_data.password)
+    async with registration_lock:
+        if len(shards) > 1 and await find_user_by_email(user_data.email):
+            raise HTTPException(status_code=400, detail="Email already registered")
+        try:
+            async with shards.pool(user_id).transaction() as db:
+                await db.execute(
+                    "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (user_id, user_data.name, user_data.email, password_hash, created_at)
+                )
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create token
-    access_token = create_access_token(data={"sub": user_id})
+    access_token = create_access_token(data={"sub": str(user_id)})
     
     return TokenResponse(
         access_token=access_token,
@@ -309,16 +1089,18 @@ async def register(user_data: UserRegister):
 
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
-    db = await get_db()
-    async with db.execute("SELECT * FROM users WHERE email = ?", (credentials.email,)) as cursor:
-        row = await cursor.fetchone()
-        user = dict(row) if row else None
-    await db.close()
-    
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    user = await find_user_by_email(credentials.email)
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token = create_access_token(data={"sub": user["id"]})
+    # Upgrade hashes made with an old cost factor while we have the plaintext
+    if password_hasher.needs_rehash(user["password_hash"]):
+        new_hash = await hash_password(credentials.password)
+        async with shards.pool(user["id"]).transaction() as db:
+            await db.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user["id"]))
+        user_cache.invalidate_user(user["id"])
+    
+    access_token = create_access_token(data={"sub": str(user["id"])})
     
     return TokenResponse(
         access_token=access_token,
@@ -341,11 +1123,26 @@ async def get_me(current_user = Depends(get_current_user)):
 
 # ========== HABIT ENDPOINTS ==========
 
+# The habit log and mood entry upserts, shared by the single, hot tier, batch
+# and import writes. A log is only written for a habit owned by the user
+# given as the last parameter, and on conflict goes to that user.
+HABIT_LOG_UPSERT = """
+    INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp)
+    SELECT ?, id, user_id, ?, ?, ?, ? FROM habits WHERE id = ? AND user_id = ?
+    ON CONFLICT (habit_id, date) DO UPDATE SET
+        user_id = excluded.user_id, completed = excluded.completed, notes = excluded.notes
+"""
+MOOD_ENTRY_UPSERT = """
+    INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, date, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, date) DO UPDATE SET
+        mood_level = excluded.mood_level, energy_level = excluded.energy_level,
+        sleep_hours = excluded.sleep_hours, notes = excluded.notes
+"""
+
 @api_router.post("/habits", response_model=Habit)
-async def create_habit(habit_data: HabitCreate, current_user = Depends(get_current_user)):
-    db = await get_db()
-    
-    habit_id = str(uuid.uuid4())
+async def create_habit(habit_data: HabitCreate, current_user = Depends(get_current_user), db = Depends(get_db)):
+    habit_id = uuid.uuid4()
     created_at = datetime.utcnow()
     
     await db.execute(
@@ -354,8 +1151,9 @@ async def create_habit(habit_data: HabitCreate, current_user = Depends(get_curre
         (habit_id, current_user["id"], habit_data.name, habit_data.description,
          habit_data.frequency, habit_data.color, habit_data.icon, habit_data.target_per_week, created_at)
     )
+    # Commit before invalidating so a concurrent /analytics can't cache the pre-write state
     await db.commit()
-    await db.close()
+    user_data_changed(current_user["id"])
     
     return Habit(
         id=habit_id,
@@ -370,150 +1168,278 @@ async def create_habit(habit_data: HabitCreate, current_user = Depends(get_curre
     )
 
 @api_router.get("/habits", response_model=List[Habit])
-async def get_habits(current_user = Depends(get_current_user)):
-    db = await get_db()
-    async with db.execute("SELECT * FROM habits WHERE user_id = ?", (current_user["id"],)) as cursor:
+async def get_habits(current_user = Depends(get_current_user), db = Depends(get_db)):
+    async with db.execute(
+        f"SELECT {habit_encoder.select} FROM habits WHERE user_id = ?", (current_user["id"],)
+    ) as cursor:
         rows = await cursor.fetchall()
-        habits = [dict(row) for row in rows]
-    await db.close()
     
-    return [Habit(**h) for h in habits]
+    return habit_encoder.response(rows)
 
 @api_router.post("/habits/log", response_model=HabitLog)
-async def log_habit(log_data: HabitLogCreate, current_user = Depends(get_current_user)):
-    db = await get_db()
+async def log_habit(log_data: HabitLogCreate, current_user = Depends(get_current_user_no_db)):
+    error = date_error(log_data.date)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    habit_id = storage_codecs.parse_uuid(log_data.habit_id)
+    if habit_id is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
     
-    # Check if log exists
-    async with db.execute(
-        "SELECT * FROM habit_logs WHERE habit_id = ? AND date = ?",
-        (log_data.habit_id, log_data.date)
-    ) as cursor:
-        row = await cursor.fetchone()
-        existing_log = dict(row) if row else None
+    if hot_tier is not None:
+        window = await hot_tier.window(current_user["id"])
+        day = date.fromisoformat(log_data.date)
+        if day >= window.start and habit_id in window.habit_ids:
+            return log_habit_hot(window, current_user["id"], habit_id, day, log_data)
     
-    if existing_log:
-        # Update
-        await db.execute(
-            "UPDATE habit_logs SET completed = ?, notes = ? WHERE id = ?",
-            (log_data.completed, log_data.notes, existing_log["id"])
-        )
-        log_id = existing_log["id"]
-    else:
-        # Insert
-        log_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow()
-        await db.execute(
-            """INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (log_id, log_data.habit_id, current_user["id"], log_data.date, log_data.completed, log_data.notes, timestamp)
-        )
-    
-    await db.commit()
-    
-    # Fetch the log
-    async with db.execute("SELECT * FROM habit_logs WHERE id = ?", (log_id,)) as cursor:
-        row = await cursor.fetchone()
-        log = dict(row)
-    await db.close()
+    async def write(db):
+        # One atomic upsert, which writes nothing unless the caller owns the habit
+        async with db.execute(
+            HABIT_LOG_UPSERT + " RETURNING id, habit_id, user_id, date, completed, notes, timestamp",
+            (uuid.uuid4(), date.fromisoformat(log_data.date), log_data.completed, log_data.notes,
+             datetime.utcnow(), habit_id, current_user["id"])
+        ) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
     
+    log = await shards.writer(current_user["id"]).submit(write)
+    if log is None:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    user_data_changed(current_user["id"])
     return HabitLog(**log)
 
-@api_router.get("/habits/logs", response_model=List[HabitLog])
-async def get_habit_logs(habit_id: Optional[str] = None, current_user = Depends(get_current_user)):
-    db = await get_db()
+def log_habit_hot(window, user_id: uuid.UUID, habit_id: uuid.UUID, day: date, log_data: HabitLogCreate) -> HabitLog:
+    """log_habit on the hot tier: the same upsert, applied to the window
+    first and written behind."""
+    key = (habit_id, day)
+    log = dict(window.logs.get(key) or {
+        "id": uuid.uuid4(), "habit_id": habit_id, "user_id": user_id, "date": day, "timestamp": datetime.utcnow(),
+    })
+    log.update(completed=log_data.completed, notes=log_data.notes)
     
-    if habit_id:
+    async def write(db):
         async with db.execute(
-            "SELECT * FROM habit_logs WHERE user_id = ? AND habit_id = ? ORDER BY date DESC",
-            (current_user["id"], habit_id)
+            HABIT_LOG_UPSERT + " RETURNING id, timestamp",
+            (log["id"], day, log["completed"], log["notes"], log["timestamp"], habit_id, user_id)
         ) as cursor:
-            rows = await cursor.fetchall()
-    else:
+            row = await cursor.fetchone()
+        # A row written meanwhile outside the hot tier keeps its own id
+        if row is not None and window.logs.get(key) is log:
+            log.update(id=row["id"], timestamp=row["timestamp"])
+    
+    hot_tier.write_behind(user_id, write)
+    window.logs[key] = log
+    analytics_cache.bump(user_id)
+    return HabitLog(**log)
+
+@api_router.post("/habits/log/batch", response_model=BatchResponse)
+async def log_habits_batch(entries: List[HabitLogCreate], current_user = Depends(get_current_user_no_db)):
+    check_batch_size(entries)
+    user_id = current_user["id"]
+    
+    # The connection goes back to the pool before waiting on the writer
+    async with user_transaction(user_id) as db:
+        async with db.execute("SELECT id FROM habits WHERE user_id = ?", (user_id,)) as cursor:
+            owned_habits = {row["id"] for row in await cursor.fetchall()}
+    
+    results = {}
+    valid = []
+    for i, entry in enumerate(entries):
+        habit_id = storage_codecs.parse_uuid(entry.habit_id)
+        error = date_error(entry.date) or (None if habit_id in owned_habits else "Unknown habit")
+        if error:
+            results[i] = BatchItemResult(index=i, status="error", error=error)
+        else:
+            valid.append((i, habit_id, date.fromisoformat(entry.date), entry))
+    
+    async def write(db):
+        dates = sorted({day for _, _, day, _ in valid})
         async with db.execute(
-            "SELECT * FROM habit_logs WHERE user_id = ? ORDER BY date DESC",
-            (current_user["id"],)
+            f"SELECT id, habit_id, date FROM habit_logs WHERE user_id = ? AND date IN ({', '.join('?' * len(dates))})",
+            (user_id, *dates)
         ) as cursor:
-            rows = await cursor.fetchall()
+            log_ids = {(row["habit_id"], row["date"]): row["id"] for row in await cursor.fetchall()}
+        
+        rows = []
+        timestamp = datetime.utcnow()
+        for i, habit_id, day, entry in valid:
+            key = (habit_id, day)
+            status = "updated" if key in log_ids else "created"
+            log_id = log_ids.setdefault(key, uuid.uuid4())
+            results[i] = BatchItemResult(index=i, status=status, id=log_id)
+            rows.append((log_id, day, entry.completed, entry.notes, timestamp, habit_id, user_id))
+        
+        # Later entries for the same habit and day win, as with repeated single calls
+        await db.executemany(HABIT_LOG_UPSERT, rows)
     
-    logs = [dict(row) for row in rows]
-    await db.close()
+    if valid:
+        await shards.writer(user_id).submit(write)
+        user_data_changed(user_id)
+    return batch_response([results[i] for i in range(len(entries))])
+
+@api_router.get("/habits/logs", response_model=List[HabitLog])
+async def get_habit_logs(
+    response: Response,
+    habit_id: Optional[uuid.UUID] = None,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user_no_db),
+):
+    user_id = current_user["id"]
+    date_from, date_to = parse_date_param(date_from), parse_date_param(date_to)
+    if hot_tier is not None and date_from is not None and cursor is None:
+        window = await hot_tier.window(user_id)
+        if date_from >= window.start:
+            records = window.logs.values()
+            if habit_id:
+                records = [log for log in records if log["habit_id"] == habit_id]
+            logs = hot_page(records, habit_log_encoder.columns, date_from, date_to, limit, response)
+            return habit_log_encoder.response(logs, response.headers)
+    
+    where, params = ["user_id = ?"], [user_id]
+    if habit_id:
+        where.append("habit_id = ?")
+        params.append(habit_id)
+    
+    async with user_transaction(user_id) as db:
+        logs = await fetch_page(db, "habit_logs", habit_log_encoder.select, where, params, ("date", "id"),
+                                date_from, date_to, cursor, limit, response)
     
-    return [HabitLog(**log) for log in logs]
+    return habit_log_encoder.response(logs, response.headers)
 
 # ========== MOOD ENDPOINTS ==========
 
 @api_router.post("/mood", response_model=MoodEntry)
-async def create_mood_entry(entry_data: MoodEntryCreate, current_user = Depends(get_current_user)):
-    db = await get_db()
+async def create_mood_entry(entry_data: MoodEntryCreate, current_user = Depends(get_current_user_no_db)):
+    error = date_error(entry_data.date)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
-    # Check if entry exists
-    async with db.execute(
-        "SELECT * FROM mood_entries WHERE user_id = ? AND date = ?",
-        (current_user["id"], entry_data.date)
-    ) as cursor:
-        row = await cursor.fetchone()
-        existing_entry = dict(row) if row else None
+    if hot_tier is not None:
+        window = await hot_tier.window(current_user["id"])
+        day = date.fromisoformat(entry_data.date)
+        if day >= window.start:
+            return create_mood_entry_hot(window, current_user["id"], day, entry_data)
     
-    if existing_entry:
-        # Update
-        await db.execute(
-            """UPDATE mood_entries SET mood_level = ?, energy_level = ?, sleep_hours = ?, notes = ?
-               WHERE id = ?""",
-            (entry_data.mood_level, entry_data.energy_level, entry_data.sleep_hours, entry_data.notes, existing_entry["id"])
-        )
-        entry_id = existing_entry["id"]
-    else:
-        # Insert
-        entry_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow()
-        await db.execute(
-            """INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, date, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (entry_id, current_user["id"], entry_data.mood_level, entry_data.energy_level,
-             entry_data.sleep_hours, entry_data.notes, entry_data.date, timestamp)
-        )
+    async def write(db):
+        async with db.execute(
+            MOOD_ENTRY_UPSERT + " RETURNING id, user_id, mood_level, energy_level, sleep_hours, notes, date, timestamp",
+            (uuid.uuid4(), current_user["id"], entry_data.mood_level, entry_data.energy_level,
+             entry_data.sleep_hours, entry_data.notes, date.fromisoformat(entry_data.date), datetime.utcnow())
+        ) as cursor:
+            return dict(await cursor.fetchone())
     
-    await db.commit()
+    entry = await shards.writer(current_user["id"]).submit(write)
+    user_data_changed(current_user["id"])
+    return MoodEntry(**entry)
+
+def create_mood_entry_hot(window, user_id: uuid.UUID, day: date, entry_data: MoodEntryCreate) -> MoodEntry:
+    """create_mood_entry on the hot tier, like log_habit_hot."""
+    entry = dict(window.moods.get(day) or {
+        "id": uuid.uuid4(), "user_id": user_id, "date": day, "timestamp": datetime.utcnow(),
+    })
+    entry.update(mood_level=entry_data.mood_level, energy_level=entry_data.energy_level,
+                 sleep_hours=entry_data.sleep_hours, notes=entry_data.notes)
     
-    # Fetch the entry
-    async with db.execute("SELECT * FROM mood_entries WHERE id = ?", (entry_id,)) as cursor:
-        row = await cursor.fetchone()
-        entry = dict(row)
-    await db.close()
+    async def write(db):
+        async with db.execute(
+            MOOD_ENTRY_UPSERT + " RETURNING id, timestamp",
+            (entry["id"], user_id, entry["mood_level"], entry["energy_level"], entry["sleep_hours"],
+             entry["notes"], day, entry["timestamp"])
+        ) as cursor:
+            row = await cursor.fetchone()
+        if window.moods.get(day) is entry:
+            entry.update(id=row["id"], timestamp=row["timestamp"])
     
+    hot_tier.write_behind(user_id, write)
+    window.moods[day] = entry
+    analytics_cache.bump(user_id)
     return MoodEntry(**entry)
 
+@api_router.post("/mood/batch", response_model=BatchResponse)
+async def create_mood_entries_batch(entries: List[MoodEntryCreate], current_user = Depends(get_current_user_no_db)):
+    check_batch_size(entries)
+    user_id = current_user["id"]
+    
+    results = {}
+    valid = []
+    for i, entry in enumerate(entries):
+        error = date_error(entry.date)
+        if error:
+            results[i] = BatchItemResult(index=i, status="error", error=error)
+        else:
+            valid.append((i, date.fromisoformat(entry.date), entry))
+    
+    async def write(db):
+        dates = sorted({day for _, day, _ in valid})
+        async with db.execute(
+            f"SELECT id, date FROM mood_entries WHERE user_id = ? AND date IN ({', '.join('?' * len(dates))})",
+            (user_id, *dates)
+        ) as cursor:
+            entry_ids = {row["date"]: row["id"] for row in await cursor.fetchall()}
+        
+        rows = []
+        timestamp = datetime.utcnow()
+        for i, day, entry in valid:
+            status = "updated" if day in entry_ids else "created"
+            entry_id = entry_ids.setdefault(day, uuid.uuid4())
+            results[i] = BatchItemResult(index=i, status=status, id=entry_id)
+            rows.append((entry_id, user_id, entry.mood_level, entry.energy_level,
+                         entry.sleep_hours, entry.notes, day, timestamp))
+        
+        await db.executemany(MOOD_ENTRY_UPSERT, rows)
+    
+    if valid:
+        await shards.writer(user_id).submit(write)
+        user_data_changed(user_id)
+    return batch_response([results[i] for i in range(len(entries))])
+
 @api_router.get("/mood", response_model=List[MoodEntry])
-async def get_mood_entries(current_user = Depends(get_current_user)):
-    db = await get_db()
-    async with db.execute(
-        "SELECT * FROM mood_entries WHERE user_id = ? ORDER BY date DESC",
-        (current_user["id"],)
-    ) as cursor:
-        rows = await cursor.fetchall()
-        entries = [dict(row) for row in rows]
-    await db.close()
+async def get_mood_entries(
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user_no_db),
+):
+    user_id = current_user["id"]
+    date_from, date_to = parse_date_param(date_from), parse_date_param(date_to)
+    if hot_tier is not None and date_from is not None and cursor is None:
+        window = await hot_tier.window(user_id)
+        if date_from >= window.start:
+            entries = hot_page(window.moods.values(), mood_entry_encoder.columns, date_from, date_to, limit, response)
+            return mood_entry_encoder.response(entries, response.headers)
+    
+    async with user_transaction(user_id) as db:
+        entries = await fetch_page(db, "mood_entries", mood_entry_encoder.select, ["user_id = ?"], [user_id],
+                                   ("date", "id"), date_from, date_to, cursor, limit, response)
     
-    return [MoodEntry(**e) for e in entries]
+    return mood_entry_encoder.response(entries, response.headers)
 
 # ========== FOCUS ENDPOINTS ==========
 
 @api_router.post("/focus", response_model=FocusSession)
-async def create_focus_session(session_data: FocusSessionCreate, current_user = Depends(get_current_user)):
-    db = await get_db()
-    
-    session_id = str(uuid.uuid4())
+async def create_focus_session(session_data: FocusSessionCreate, current_user = Depends(get_current_user_no_db)):
+    error = date_error(session_data.date)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    session_id = uuid.uuid4()
+    day = date.fromisoformat(session_data.date)
     now = datetime.utcnow()
     start_time = now - timedelta(minutes=session_data.duration_minutes)
     
-    await db.execute(
-        """INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date, completed)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-        (session_id, current_user["id"], session_data.task_name, session_data.duration_minutes,
-         start_time, now, session_data.date, session_data.completed)
-    )
-    await db.commit()
-    await db.close()
+    async def write(db):
+        await db.execute(
+            """INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date, completed)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (session_id, current_user["id"], session_data.task_name, session_data.duration_minutes,
+             start_time, now, day, session_data.completed)
+        )
+    
+    await shards.writer(current_user["id"]).submit(write)
+    analytics_cache.bump(current_user["id"])
     
     return FocusSession(
         id=session_id,
@@ -522,153 +1448,563 @@ async def create_focus_session(session_data: FocusSessionCreate, current_user =
         duration_minutes=session_data.duration_minutes,
         start_time=start_time,
         end_time=now,
-        date=session_data.date,
+        date=day,
         completed=session_data.completed
     )
 
+@api_router.post("/focus/batch", response_model=BatchResponse)
+async def create_focus_sessions_batch(entries: List[FocusSessionCreate], current_user = Depends(get_current_user_no_db)):
+    check_batch_size(entries)
+    user_id = current_user["id"]
+    
+    results = []
+    rows = []
+    now = datetime.utcnow()
+    for i, entry in enumerate(entries):
+        error = date_error(entry.date)
+        if error:
+            results.append(BatchItemResult(index=i, status="error", error=error))
+            continue
+        session_id = uuid.uuid4()
+        start_time = now - timedelta(minutes=entry.duration_minutes)
+        results.append(BatchItemResult(index=i, status="created", id=session_id))
+        rows.append((session_id, user_id, entry.task_name, entry.duration_minutes,
+                     start_time, now, date.fromisoformat(entry.date), entry.completed))
+    
+    async def write(db):
+        await db.executemany(
+            """INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date, completed)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+    
+    if rows:
+        await shards.writer(user_id).submit(write)
+        analytics_cache.bump(user_id)
+    return batch_response(results)
+
 @api_router.get("/focus", response_model=List[FocusSession])
-async def get_focus_sessions(current_user = Depends(get_current_user)):
-    db = await get_db()
-    async with db.execute(
-        "SELECT * FROM focus_sessions WHERE user_id = ? ORDER BY start_time DESC",
-        (current_user["id"],)
-    ) as cursor:
-        rows = await cursor.fetchall()
-        sessions = [dict(row) for row in rows]
-    await db.close()
+async def get_focus_sessions(
+    response: Response,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    sessions = await fetch_page(db, "focus_sessions", focus_session_encoder.select, ["user_id = ?"],
+                                [current_user["id"]], ("start_time", "id"), parse_date_param(date_from),
+                                parse_date_param(date_to), cursor, limit, response)
     
-    return [FocusSession(**s) for s in sessions]
+    return focus_session_encoder.response(sessions, response.headers)
 
-# ========== ANALYTICS ENDPOINTS ==========
+# ========== SYNC ENDPOINTS ==========
 
-@api_router.get("/analytics", response_model=AnalyticsResponse)
-async def get_analytics(current_user = Depends(get_current_user)):
-    db = await get_db()
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync(
+    since: Optional[int] = Query(None, ge=0, le=2**63 - 1),
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    current_user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """Return every record created or changed after ``since``.
+
+    Omit ``since`` for a full sync, then pass back the returned cursor. At
+    most ``limit`` records per table come back; when ``has_more`` is set,
+    call again with the new cursor.
+    """
+    changes = {}
+    for table, encoder in sync_encoders.items():
+        async with db.execute(
+            f"""SELECT {encoder.select}, change_seq FROM {table}
+                WHERE user_id = ? AND change_seq > ? ORDER BY change_seq LIMIT ?""",
+            (current_user["id"], -1 if since is None else since, limit + 1)
+        ) as cursor:
+            changes[table] = await cursor.fetchall()
     
-    # Get data for last 7 days
-    today = datetime.utcnow().date()
-    week_ago = today - timedelta(days=7)
-    week_ago_str = week_ago.strftime("%Y-%m-%d")
+    # If any table was truncated, cut every table at the lowest sequence
+    # that was fully delivered so the next call resumes without gaps
+    truncated = [rows[limit - 1]["change_seq"] for rows in changes.values() if len(rows) > limit]
+    has_more = bool(truncated)
+    if has_more:
+        new_cursor = min(truncated)
+        changes = {table: [r for r in rows[:limit] if r["change_seq"] <= new_cursor]
+                   for table, rows in changes.items()}
+    else:
+        new_cursor = max((r["change_seq"] for rows in changes.values() for r in rows), default=since or 0)
     
-    # Fetch data
-    async with db.execute(
-        "SELECT * FROM habit_logs WHERE user_id = ? AND date >= ?",
-        (current_user["id"], week_ago_str)
-    ) as cursor:
-        habit_logs = [dict(row) for row in await cursor.fetchall()]
+    return json_response({
+        "cursor": new_cursor,
+        "has_more": has_more,
+        **{table: sync_encoders[table].dicts(rows) for table, rows in changes.items()},
+    })
+
+# ========== SEARCH ENDPOINTS ==========
+
+def fts_query(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query of quoted prefix terms.
+
+    Only word characters survive, so user input can never inject FTS5
+    operators, column filters or unbalanced quotes.
+    """
+    terms = re.findall(r"\w+", q)[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+@api_router.get("/search", response_model=List[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, pattern=r"^(habit|habit_log|mood_entry|focus_session)$"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    offset: int = Query(0, ge=0),
+    current_user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """Ranked search over habit names and descriptions, habit-log and mood
+    notes and focus task names. Matches are wrapped in ``<mark>`` tags."""
+    terms = fts_query(q)
+    if terms is None:
+        return []
+    match = f'user_id : "{current_user["id"].hex.upper()}" AND {{title body}} : ({terms})'
     
-    async with db.execute(
-        "SELECT * FROM mood_entries WHERE user_id = ? AND date >= ?",
-        (current_user["id"], week_ago_str)
-    ) as cursor:
-        mood_entries = [dict(row) for row in await cursor.fetchall()]
+    query = """
+        SELECT d.kind, d.record_id, d.date,
+               highlight(search_index, 0, '<mark>', '</mark>') AS title,
+               snippet(search_index, 1, '<mark>', '</mark>', '…', 12) AS snippet,
+               bm25(search_index, 10.0, 1.0, 0.0) AS rank
+        FROM search_index JOIN search_documents d ON d.id = search_index.rowid
+        WHERE search_index MATCH ?
+    """
+    params = [match]
+    if kind is not None:
+        query += " AND d.kind = ?"
+        params.append(kind)
+    query += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit, offset]
     
-    async with db.execute(
-        "SELECT * FROM focus_sessions WHERE user_id = ? AND date >= ?",
-        (current_user["id"], week_ago_str)
-    ) as cursor:
-        focus_sessions = [dict(row) for row in await cursor.fetchall()]
+    async with db.execute(query, params) as cursor:
+        rows = await cursor.fetchall()
+    return [
+        SearchResult(
+            kind=row["kind"], id=row["record_id"], date=row["date"],
+            title=row["title"], snippet=row["snippet"], score=-row["rank"],
+        )
+        for row in rows
+    ]
+
+# ========== EXPORT ENDPOINTS ==========
+
+# (type, table, encoder, index order) for every exported record type
+EXPORT_SOURCES = (
+    ("habit", "habits", habit_encoder, "created_at"),
+    ("habit_log", "habit_logs", habit_log_encoder, "date, id"),
+    ("mood_entry", "mood_entries", mood_entry_encoder, "date, id"),
+    ("focus_session", "focus_sessions", focus_session_encoder, "start_time, id"),
+)
+EXPORT_CSV_COLUMNS = ["type"] + list(dict.fromkeys(
+    column for _, _, encoder, _ in EXPORT_SOURCES for column in encoder.columns
+))
+
+export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+async def export_chunks(user_id: uuid.UUID):
+    """Yield ``(type, records)`` chunks of at most EXPORT_CHUNK_SIZE rows.
+
+    The endpoint's own connection is released before the body is sent, so
+    the stream reads from a pool connection of its own. All tables are read
+    inside one transaction and therefore from one consistent snapshot. The
+    next chunk is only fetched once the previous one has been sent, so a
+    slow client slows the reads down instead of filling buffers.
+    """
+    if hot_tier is not None:
+        await hot_tier.settle(user_id)
+    async with export_slots, shards.pool(user_id).connection() as db:
+        await db.execute("BEGIN")
+        for record_type, table, encoder, order_by in EXPORT_SOURCES:
+            async with db.execute(
+                f"SELECT {encoder.select} FROM {table} WHERE user_id = ? ORDER BY {order_by}",
+                (user_id,)
+            ) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(EXPORT_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    yield record_type, encoder.dicts(rows)
+
+async def ndjson_export(user_id: uuid.UUID):
+    async for record_type, records in export_chunks(user_id):
+        yield b"".join(orjson.dumps({"type": record_type, **record}) + b"\n" for record in records)
+
+def csv_value(value):
+    # Spelled the way the NDJSON export and the JSON API spell them
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def csv_export(user_id: uuid.UUID):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    async for record_type, records in export_chunks(user_id):
+        for record in records:
+            writer.writerow({key: csv_value(value) for key, value in record.items()} | {"type": record_type})
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+@api_router.get("/export")
+async def export_data(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user = Depends(get_current_user),
+):
+    """Stream all of the user's habits, habit logs, mood entries and focus
+    sessions as NDJSON (one object per line, tagged with ``type``) or as one
+    CSV with a ``type`` column and the union of all columns."""
+    if export_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many exports in progress", headers={"Retry-After": "5"})
     
-    async with db.execute(
-        "SELECT * FROM habits WHERE user_id = ?",
-        (current_user["id"],)
-    ) as cursor:
-        habits = [dict(row) for row in await cursor.fetchall()]
+    if format == "csv":
+        body, media_type = csv_export(current_user["id"]), "text/csv; charset=utf-8"
+    else:
+        body, media_type = ndjson_export(current_user["id"]), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="pulse-export.{format}"',
+    })
+
+# ========== IMPORT ENDPOINTS ==========
+
+IMPORT_MODELS = {
+    "habit": HabitImport,
+    "habit_log": HabitLogImport,
+    "mood_entry": MoodEntryImport,
+    "focus_session": FocusSessionImport,
+}
+
+# Latest import per user, for GET /import/progress
+import_progress: Dict[uuid.UUID, ImportProgress] = {}
+import_slots = asyncio.Semaphore(IMPORT_MAX_CONCURRENT)
+
+def add_import_error(progress: ImportProgress, row: int, error: str):
+    progress.rows_failed += 1
+    if len(progress.errors) < IMPORT_MAX_ERRORS:
+        progress.errors.append(ImportRowError(row=row, error=error))
+
+def parse_import_record(record: dict):
+    """Validate one record; returns (type, model) or raises ValueError."""
+    model = IMPORT_MODELS.get(record.get("type"))
+    if model is None:
+        raise ValueError(f"Unknown type {record.get('type')!r}")
+    try:
+        item = model.model_validate(record)
+    except ValidationError as e:
+        first = e.errors()[0]
+        raise ValueError(f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}")
+    error = date_error(item.date) if hasattr(item, "date") else None
+    if error:
+        raise ValueError(error)
+    return record["type"], item
+
+async def write_import_chunk(user_id: uuid.UUID, chunk: Dict[str, list]) -> Dict[int, str]:
+    """Write one chunk of validated rows in a single writer transaction.
+
+    ``chunk`` maps each type to ``(row, model)`` pairs. Habits and focus
+    sessions keep the ids from the file so habit logs can refer to them,
+    unless the id belongs to another user. Habit logs and mood entries are
+    matched on their day instead, like the batch endpoints. Returns the rows
+    that were rejected, with the reason.
+    """
+    now = datetime.utcnow()
+    
+    async def foreign_ids(db, table, items):
+        ids = [item.id for _, item in items if item.id]
+        if not ids:
+            return set()
+        async with db.execute(
+            f"SELECT id FROM {table} WHERE id IN ({', '.join('?' * len(ids))}) AND user_id != ?",
+            (*ids, user_id)
+        ) as cursor:
+            return {row["id"] for row in await cursor.fetchall()}
     
-    await db.close()
+    async def write(db):
+        rejected = {}
+        
+        taken = await foreign_ids(db, "habits", chunk["habit"])
+        habits = []
+        for row, item in chunk["habit"]:
+            if item.id in taken:
+                rejected[row] = "Habit id belongs to another user"
+                continue
+            habits.append((item.id or uuid.uuid4(), user_id, item.name, item.description, item.frequency,
+                           item.color, item.icon, item.target_per_week, item.created_at or now))
+        await db.executemany(
+            """INSERT INTO habits (id, user_id, name, description, frequency, color, icon, target_per_week, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (id) DO UPDATE SET
+                   name = excluded.name, description = excluded.description, frequency = excluded.frequency,
+                   color = excluded.color, icon = excluded.icon, target_per_week = excluded.target_per_week
+               WHERE habits.user_id = excluded.user_id""",
+            habits
+        )
+        
+        # Checked after the habits above are written, so logs may refer to
+        # habits from the same file
+        habit_ids = sorted({item.habit_id for _, item in chunk["habit_log"]})
+        owned_habits = set()
+        if habit_ids:
+            async with db.execute(
+                f"SELECT id FROM habits WHERE id IN ({', '.join('?' * len(habit_ids))}) AND user_id = ?",
+                (*habit_ids, user_id)
+            ) as cursor:
+                owned_habits = {row["id"] for row in await cursor.fetchall()}
+        logs = []
+        for row, item in chunk["habit_log"]:
+            if item.habit_id not in owned_habits:
+                rejected[row] = "Unknown habit"
+                continue
+            logs.append((uuid.uuid4(), date.fromisoformat(item.date), item.completed, item.notes,
+                         item.timestamp or now, item.habit_id, user_id))
+        await db.executemany(HABIT_LOG_UPSERT, logs)
+        
+        await db.executemany(
+            MOOD_ENTRY_UPSERT,
+            [(uuid.uuid4(), user_id, item.mood_level, item.energy_level, item.sleep_hours, item.notes,
+              date.fromisoformat(item.date), item.timestamp or now) for _, item in chunk["mood_entry"]]
+        )
+        
+        taken = await foreign_ids(db, "focus_sessions", chunk["focus_session"])
+        sessions = []
+        for row, item in chunk["focus_session"]:
+            if item.id in taken:
+                rejected[row] = "Focus session id belongs to another user"
+                continue
+            sessions.append((item.id or uuid.uuid4(), user_id, item.task_name, item.duration_minutes,
+                             item.start_time or now, item.end_time or now, date.fromisoformat(item.date),
+                             item.completed))
+        await db.executemany(
+            """INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date, completed)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (id) DO UPDATE SET
+                   task_name = excluded.task_name, duration_minutes = excluded.duration_minutes,
+                   start_time = excluded.start_time, end_time = excluded.end_time,
+                   date = excluded.date, completed = excluded.completed
+               WHERE focus_sessions.user_id = excluded.user_id""",
+            sessions
+        )
+        return rejected
     
-    # Calculate weekly stats
-    completed_habits = sum(1 for log in habit_logs if log["completed"])
-    total_focus_minutes = sum(s["duration_minutes"] for s in focus_sessions)
+    return await shards.writer(user_id).submit(write)
+
+@api_router.post("/import", response_model=ImportProgress)
+async def import_data(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user = Depends(get_current_user_no_db),
+):
+    """Import records from a streamed NDJSON or CSV upload in the format GET
+    /export produces: a ``type`` of habit, habit_log, mood_entry or
+    focus_session plus that type's fields.
+
+    The body is parsed as it arrives and written in chunks of
+    IMPORT_CHUNK_SIZE rows, each in its own short transaction through the
+    group-commit writer, so other users' writes interleave with a long
+    import. Invalid rows are skipped and reported; the returned report is
+    also available from GET /import/progress while the import runs.
+    """
+    user_id = current_user["id"]
+    running = import_progress.get(user_id)
+    if running is not None and running.state == "running":
+        raise HTTPException(status_code=409, detail="An import is already running")
+    if import_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many imports in progress", headers={"Retry-After": "5"})
     
-    avg_mood = sum(e["mood_level"] for e in mood_entries) / len(mood_entries) if mood_entries else 0
-    avg_energy = sum(e["energy_level"] for e in mood_entries) / len(mood_entries) if mood_entries else 0
-    avg_sleep = sum(e["sleep_hours"] for e in mood_entries) / len(mood_entries) if mood_entries else 0
+    progress = import_progress[user_id] = ImportProgress(state="running", started_at=datetime.utcnow())
+    records = (csv_records if format == "csv" else ndjson_records)(request.stream())
+    chunk = {record_type: [] for record_type in IMPORT_MODELS}
+    chunk_size = 0
+    in_flight = None
     
-    expected_completions = len(habits) * 7
-    completion_rate = (completed_habits / expected_completions * 100) if expected_completions > 0 else 0
+    async def write_chunk(chunk, chunk_size):
+        try:
+            rejected = await write_import_chunk(user_id, chunk)
+            if hot_tier is not None:
+                hot_tier.evict(user_id)
+        except sqlite3.Error as e:
+            # The chunk's transaction was rolled back as a whole
+            rejected = {row: f"Database error: {e}" for items in chunk.values() for row, _ in items}
+        for row, error in sorted(rejected.items()):
+            add_import_error(progress, row, error)
+        progress.rows_imported += chunk_size - len(rejected)
     
-    weekly_stats = WeeklyStats(
-        total_habits_completed=completed_habits,
-        total_focus_minutes=total_focus_minutes,
-        average_mood=round(avg_mood, 1),
-        average_energy=round(avg_energy, 1),
-        average_sleep=round(avg_sleep, 1),
-        habit_completion_rate=round(completion_rate, 1)
-    )
+    async def flush():
+        # One chunk is written while the next one is parsed and validated;
+        # the writer runs ops in order, so later chunks see earlier ones
+        nonlocal chunk, chunk_size, in_flight
+        if in_flight is not None:
+            await in_flight
+        in_flight = asyncio.ensure_future(write_chunk(chunk, chunk_size))
+        chunk = {record_type: [] for record_type in IMPORT_MODELS}
+        chunk_size = 0
     
-    # Generate insights
-    insights = []
-    
-    # Sleep vs Focus correlation
-    if mood_entries and focus_sessions:
-        sleep_focus_map = defaultdict(list)
-        for mood in mood_entries:
-            day_focus = [s["duration_minutes"] for s in focus_sessions if s["date"] == mood["date"]]
-            if day_focus:
-                sleep_bucket = "low" if mood["sleep_hours"] < 6 else "high"
-                sleep_focus_map[sleep_bucket].extend(day_focus)
-        
-        if "low" in sleep_focus_map and "high" in sleep_focus_map:
-            avg_low = sum(sleep_focus_map["low"]) / len(sleep_focus_map["low"])
-            avg_high = sum(sleep_focus_map["high"]) / len(sleep_focus_map["high"])
-            diff_pct = abs(avg_high - avg_low) / avg_high * 100 if avg_high > 0 else 0
-            
-            if avg_low < avg_high:
-                insights.append(InsightItem(
-                    type="sleep_focus",
-                    title="Sleep Affects Focus",
-                    description=f"On days you sleep < 6 hours, your focus drops by {round(diff_pct)}%",
-                    value=f"{round(diff_pct)}%",
-                    trend="down"
-                ))
-    
-    # Habit streaks
-    habit_streaks = {}
-    for habit in habits:
-        habit_id = habit["id"]
-        habit_specific_logs = [log for log in habit_logs if log["habit_id"] == habit_id and log["completed"]]
-        current_streak = len(habit_specific_logs)
-        habit_streaks[habit["name"]] = current_streak
-    
-    # Chart data
-    date_strings = [(week_ago + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(8)]
-    
-    mood_chart_data = [
-        {
-            "date": e["date"],
-            "mood": e["mood_level"],
-            "energy": e["energy_level"]
-        }
-        for e in sorted(mood_entries, key=lambda x: x["date"])
-    ]
+    try:
+        async with import_slots:
+            async for row, record, error in records:
+                progress.rows_read += 1
+                if error is None:
+                    try:
+                        record_type, item = parse_import_record(record)
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    add_import_error(progress, row, error)
+                    continue
+                chunk[record_type].append((row, item))
+                chunk_size += 1
+                if chunk_size >= IMPORT_CHUNK_SIZE:
+                    await flush()
+            if chunk_size:
+                await flush()
+            if in_flight is not None:
+                await in_flight
+                in_flight = None
+        progress.state = "completed"
+    except Exception:
+        progress.state = "failed"
+        raise
+    finally:
+        if in_flight is not None:
+            await asyncio.wait([in_flight])
+        progress.finished_at = datetime.utcnow()
+        if progress.rows_imported:
+            user_data_changed(user_id)
+    return progress
+
+@api_router.get("/import/progress", response_model=ImportProgress)
+async def get_import_progress(current_user = Depends(get_current_user)):
+    progress = import_progress.get(current_user["id"])
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No import found")
+    return progress
+
+# ========== HEALTH ENDPOINTS ==========
+
+@api_router.get("/health")
+async def health():
+    body = {
+        "status": "ok",
+        "shards": [
+            {
+                "path": shard.pool.path.name,
+                "db_pool": {"size": shard.pool.size, "available": shard.pool.available},
+                "write_queue": shard.writer.stats(),
+            }
+            for shard in shards
+        ],
+        "auth_cache": {"entries": len(user_cache), "hits": user_cache.hits, "misses": user_cache.misses},
+        "analytics_cache": analytics_cache.stats(),
+        "admission": admission.stats(),
+    }
+    if hot_tier is not None:
+        body["hot_tier"] = hot_tier.stats()
+    return body
+
+# ========== METRICS ENDPOINT ==========
+
+instrumentation.gauge(
+    "pulse_db_pool_available_connections", "Idle pooled SQLite connections.", ("shard",),
+    collect=lambda: [((shard.pool.path.name,), shard.pool.available) for shard in shards],
+)
+instrumentation.gauge(
+    "pulse_admission_in_flight", "Requests being served, by endpoint class.", ("class",),
+    collect=lambda: [((name,), count) for name, count in admission.in_flight.items()],
+)
+instrumentation.counter(
+    "pulse_admission_rejections_total", "Requests turned away by admission control.", ("class", "reason"),
+    collect=lambda: list(admission.rejected.items()),
+)
+instrumentation.gauge(
+    "pulse_write_queue_depth", "Writes waiting for the group-commit writer.", ("shard",),
+    collect=lambda: [((shard.pool.path.name,), shard.writer.depth) for shard in shards],
+)
+
+# Prometheus scrape target; outside /api so it needs no token
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=instrumentation.render(), media_type=METRICS_CONTENT_TYPE)
+
+# ========== ANALYTICS ENDPOINTS ==========
+
+analytics_cache = VersionedResponseCache(max_entries=ANALYTICS_CACHE_MAX_USERS)
+
+@api_router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    request: Request,
+    date_from: Optional[str] = Query(None, alias="from", pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, alias="to", pattern=DATE_PATTERN),
+    granularity: str = Query("day", pattern="^(" + "|".join(analytics.GRANULARITIES) + ")$"),
+    current_user = Depends(get_current_user_no_db),
+):
+    # Without a range: the last 7 days, with the completion rate over 7 days
+    today = datetime.utcnow().date()
+    start, end = analytics.default_window(today)
+    expected_days = analytics.WINDOW_DAYS if date_from is None and date_to is None else None
+    date_from, date_to = parse_date_param(date_from), parse_date_param(date_to)
+    if date_to is not None:
+        end = date_to
+        start = end - timedelta(days=analytics.WINDOW_DAYS)
+    if date_from is not None:
+        start = date_from
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days + 1 > ANALYTICS_MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window longer than {ANALYTICS_MAX_WINDOW_DAYS} days")
     
-    focus_chart_data = [
-        {
-            "date": date_str,
-            "minutes": sum(s["duration_minutes"] for s in focus_sessions if s["date"] == date_str)
-        }
-        for date_str in date_strings
-    ]
+    # The result only changes when the user writes (which bumps their
+    # version), the day rolls over or the window changes, so all of them go
+    # into the ETag
+    etag = analytics_cache.etag(current_user["id"], f"{today}|{start}|{end}|{granularity}")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
     
-    return AnalyticsResponse(
-        weekly_stats=weekly_stats,
-        insights=insights,
-        habit_streaks=habit_streaks,
-        mood_chart_data=mood_chart_data,
-        focus_chart_data=focus_chart_data
-    )
+    # Only a cache miss opens a transaction, so 304s and cached bodies never
+    # wait for a pooled connection or the hot tier
+    body = analytics_cache.get(current_user["id"], etag)
+    if body is None:
+        async with user_transaction(current_user["id"]) as db:
+            result = AnalyticsResponse(**await analytics.compute_analytics(
+                db, current_user["id"], start, end, granularity, expected_days
+            ))
+        body = result.model_dump_json().encode('utf-8')
+        analytics_cache.put(current_user["id"], etag, body)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
 
 # Include router
 app.include_router(api_router)
 
+admission = AdmissionController(
+    {"auth": MAX_CONCURRENT_AUTH, "reads": MAX_CONCURRENT_READS, "writes": MAX_CONCURRENT_WRITES,
+     "analytics": MAX_CONCURRENT_ANALYTICS},
+    TokenBuckets(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, RATE_LIMIT_MAX_USERS) if RATE_LIMIT_PER_SECOND > 0 else None,
+)
+# Innermost, so its 429 / 503 responses still get CORS headers and metrics
+app.add_middleware(AdmissionMiddleware, controller=admission, subject=token_subject_id, routes=app.routes)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", STATEMENTS_HEADER, DB_TIME_HEADER],
 )
+app.add_middleware(QueryLogMiddleware, query_log=query_log)
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware, metrics=instrumentation)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -676,7 +2012,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.exception_handler(PoolTimeout)
+@app.exception_handler(WriteQueueFull)
+@app.exception_handler(HasherBusy)
+async def overload_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"}, headers={"Retry-After": "1"})
+
 @app.on_event("startup")
 async def startup_db():
-    await init_db()
-    logger.info(f"SQLite database initialized at {DB_PATH}")
+    await shards.open()
+    for shard in shards:
+        await init_db(shard.pool)
+    await shards.start_writers()
+    instrumentation.start_loop_watch(METRICS_LOOP_LAG_INTERVAL)
+    logger.info(f"SQLite database initialized at {DB_PATH} ({len(shards)} shards)")
+
+@app.on_event("shutdown")
+async def shutdown_db():
+    await instrumentation.stop_loop_watch()
+    if hot_tier is not None:
+        await hot_tier.drain()
+    await shards.stop_writers()
+    await shards.close()
+    password_hasher.shutdown()
+    query_log.close()
@@ -0,0 +1,85 @@
+import hashlib
+import uuid
+from pathlib import Path
+from typing import Iterator, List
+
+from db_pool import ConnectionPool
+from write_queue import GroupCommitWriter
+
+
+def shard_index(user_id: uuid.UUID, count: int) -> int:
+    """The shard holding ``user_id`` when data is spread over ``count`` files.
+
+    The id is hashed rather than taken modulo directly so that ids which are
+    not random (name-based ones from migrated databases) spread evenly too.
+    """
+    if count == 1:
+        return 0
+    digest = hashlib.blake2b(user_id.bytes, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def shard_paths(db_path: Path, count: int) -> List[Path]:
+    """Database file of each shard.
+
+    Shard 0 is ``db_path`` itself, so a single-file database becomes shard 0
+    of a sharded one and only the users hashed elsewhere have to move.
+    """
+    return [db_path] + [db_path.with_name(f"{db_path.stem}.shard{i}{db_path.suffix}") for i in range(1, count)]
+
+
+class Shard:
+    """One database file with its own connection pool and group-commit writer."""
+
+    def __init__(self, pool: ConnectionPool, writer: GroupCommitWriter):
+        self.pool = pool
+        self.writer = writer
+
+
+class ShardRouter:
+    """Routes each user's data to one of several SQLite files.
+
+    All Pulse data is per user, so users are hash-partitioned by id across
+    the shards and every query and write for a user goes to that user's
+    shard. Each file has its own writer lock, so writes for users on
+    different shards never wait on each other. Only lookups by email (login
+    and registration) have to ask every shard.
+    """
+
+    def __init__(self, shards: List[Shard]):
+        self.shards = shards
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __iter__(self) -> Iterator[Shard]:
+        return iter(self.shards)
+
+    def __getitem__(self, index: int) -> Shard:
+        return self.shards[index]
+
+    def for_user(self, user_id: uuid.UUID) -> Shard:
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def pool(self, user_id: uuid.UUID) -> ConnectionPool:
+        return self.for_user(user_id).pool
+
+    def writer(self, user_id: uuid.UUID) -> GroupCommitWriter:
+        return self.for_user(user_id).writer
+
+    async def open(self):
+        for shard in self.shards:
+            await shard.pool.open()
+
+    async def close(self):
+        for shard in self.shards:
+            await shard.pool.close()
+
+    async def start_writers(self):
+        for shard in self.shards:
+            await shard.writer.start()
+
+    async def stop_writers(self):
+        """Stop every writer, committing what each one has queued."""
+        for shard in self.shards:
+            await shard.writer.stop()
@@ -0,0 +1,96 @@
+"""Compact on-disk encodings for ids, dates and timestamps.
+
+The API speaks UUID and ISO 8601 strings, but storing them as text costs 36
+bytes per id, 10 per date and 26 per timestamp, in every row and again in
+every index that holds the column. The schema instead declares:
+
+- ``UUID BLOB``: the 16 raw bytes of the UUID
+- ``DAY INTEGER``: days since 1970-01-01
+- ``TIMESTAMP INTEGER``: microseconds since 1970-01-01 (UTC)
+
+``register`` teaches the sqlite3 module to bind ``uuid.UUID``, ``date`` and
+``datetime`` values in these forms, and connections opened with
+``detect_types=sqlite3.PARSE_DECLTYPES`` get the Python objects back for
+columns declared with these types. Expressions carry no declared type, so
+e.g. a bucketed day comes back as a plain day number; use ``day_to_date``.
+"""
+import sqlite3
+import uuid
+from functools import lru_cache
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+_EPOCH_ORDINAL = EPOCH_DATE.toordinal()
+_MICROSECOND = timedelta(microseconds=1)
+
+# Maps ids that were not UUIDs (accepted by older imports) onto stable UUIDs
+LEGACY_ID_NAMESPACE = uuid.UUID("6f1b2c3e-5a0d-4f7e-9c61-2b8e4d7a9f10")
+
+
+def date_to_day(value: date) -> int:
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=4096)
+def day_to_date(value: int) -> date:
+    return date.fromordinal(int(value) + _EPOCH_ORDINAL)
+
+
+def datetime_to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // _MICROSECOND
+
+
+def micros_to_datetime(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+# A page of rows repeats the same user and habit ids over and over, and
+# building a UUID costs far more than a cache hit
+@lru_cache(maxsize=4096)
+def bytes_to_uuid(value: bytes) -> uuid.UUID:
+    return uuid.UUID(bytes=value)
+
+
+def register():
+    """Install the adapters and converters; safe to call more than once."""
+    sqlite3.register_adapter(uuid.UUID, lambda value: value.bytes)
+    sqlite3.register_adapter(date, date_to_day)
+    sqlite3.register_adapter(datetime, datetime_to_micros)
+    sqlite3.register_converter("UUID", bytes_to_uuid)
+    sqlite3.register_converter("DAY", day_to_date)
+    sqlite3.register_converter("TIMESTAMP", micros_to_datetime)
+
+
+def parse_uuid(value: str) -> Optional[uuid.UUID]:
+    """The UUID in ``value``, or None if it is not one."""
+    try:
+        return uuid.UUID(value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# Conversions from the old text columns, registered as SQL functions by the
+# migration. Values that cannot be converted become NULL.
+
+def legacy_uuid(value: Optional[str]) -> Optional[bytes]:
+    if value is None:
+        return None
+    return (parse_uuid(value) or uuid.uuid5(LEGACY_ID_NAMESPACE, value)).bytes
+
+
+def legacy_day(value: Optional[str]) -> Optional[int]:
+    try:
+        return date_to_day(date.fromisoformat(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def legacy_micros(value: Optional[str]) -> Optional[int]:
+    try:
+        return datetime_to_micros(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return None
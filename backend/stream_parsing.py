@@ -0,0 +1,75 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+# (record number, record, parse error)
+ParsedRecord = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode an async stream of UTF-8 byte chunks into lines.
+
+    Only the unfinished last line is buffered, so memory is bounded by the
+    longest line rather than the size of the upload. A leading BOM is dropped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """Yield one record per non-blank line of an NDJSON stream."""
+    number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if isinstance(record, dict):
+            yield number, record, None
+        else:
+            yield number, None, "Expected a JSON object"
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRecord]:
+    """Yield one dict per CSV record, keyed by the header row.
+
+    Quoted fields may contain newlines: lines are joined until their quotes
+    balance before a record is parsed. Empty fields are left out, so a CSV
+    holding several record types can share one header.
+    """
+    header = None
+    pending = []
+    quotes = 0
+    number = 0
+    async for line in iter_lines(chunks):
+        if not pending and not line.strip():
+            continue
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        values = next(csv.reader(["\n".join(pending)]))
+        pending, quotes = [], 0
+        if header is None:
+            header = values
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, None, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        yield number, {key: value for key, value in zip(header, values) if value != ""}, None
+    if pending:
+        yield number + 1, None, "Unterminated quoted field"
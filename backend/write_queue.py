@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+import aiosqlite
+
+from db_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class WriteQueueFull(Exception):
+    """Raised when the writer backlog is at its configured maximum depth."""
+
+
+class GroupCommitWriter:
+    """Single writer task that commits queued write operations in batches.
+
+    SQLite allows one writer at a time and every commit pays an fsync, so
+    concurrent check-ins that each commit on their own end up serialised on
+    the writer lock. Callers instead ``submit`` a coroutine function taking a
+    connection; the writer collects up to ``max_batch`` of them, waiting at
+    most ``max_delay_ms`` after the first, runs each inside its own savepoint
+    and commits the whole batch once. A failing operation only rolls back its
+    own savepoint and its exception is raised to that caller alone.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = 64, max_delay_ms: float = 2.0, max_depth: int = 1000):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.max_depth = max_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[aiosqlite.Connection] = None
+        self.batches_committed = 0
+        self.ops_committed = 0
+        self.ops_failed = 0
+        self.max_depth_seen = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth_seen": self.max_depth_seen,
+            "batches_committed": self.batches_committed,
+            "ops_committed": self.ops_committed,
+            "ops_failed": self.ops_failed,
+        }
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._db = await self.pool.connect()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit everything already queued, then close the writer connection."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        await self._db.close()
+        self._task = None
+        self._queue = None
+        self._db = None
+
+    def enqueue(self, op: WriteOp) -> asyncio.Future:
+        """Queue ``op`` without waiting; the future resolves once its batch commits.
+
+        The op is queued before this returns, so ops enqueued one after the
+        other run in that order, and a full queue raises right here.
+        """
+        if self._queue is None:
+            raise RuntimeError("Writer is not running")
+        if self._queue.qsize() >= self.max_depth:
+            raise WriteQueueFull(f"Write queue is at its maximum depth of {self.max_depth}")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        self.max_depth_seen = max(self.max_depth_seen, self._queue.qsize())
+        return future
+
+    async def submit(self, op: WriteOp) -> Any:
+        return await self.enqueue(op)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch):
+        db = self._db
+        outcomes = []
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                await db.execute("SAVEPOINT write_op")
+                try:
+                    result = await op(db)
+                except Exception as e:
+                    await db.execute("ROLLBACK TO write_op")
+                    await db.execute("RELEASE write_op")
+                    outcomes.append((future, e, False))
+                else:
+                    await db.execute("RELEASE write_op")
+                    outcomes.append((future, result, True))
+            await db.commit()
+        except Exception as e:
+            logger.exception(f"Group commit of {len(batch)} writes failed")
+            if db.in_transaction:
+                await db.rollback()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.ops_failed += len(batch)
+            return
+
+        self.batches_committed += 1
+        for future, value, ok in outcomes:
+            if ok:
+                self.ops_committed += 1
+            else:
+                self.ops_failed += 1
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the /analytics aggregation.
+
+Seeds a throwaway database with one user at increasing numbers of habits and
+focus sessions per day, then times the current analytics path against the
+original nested-loop implementation (kept below as ``legacy_analytics``).
+
+    python benchmarks/bench_analytics.py [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="pulse-bench-"), "bench.db")
+
+import analytics  # noqa: E402
+import server  # noqa: E402
+
+DAYS_OF_HISTORY = 8
+SCENARIOS = [
+    # (habits, focus sessions per day)
+    (10, 2),
+    (100, 2),
+    (500, 2),
+    (10, 50),
+    (100, 50),
+    (500, 200),
+]
+
+
+async def legacy_analytics(db, user_id, today):
+    """The pre-rollup algorithm: raw rows and O(n*m) scans per metric."""
+    week_ago = today - timedelta(days=7)
+    async with db.execute("SELECT * FROM habit_logs WHERE user_id = ? AND date >= ?", (user_id, week_ago)) as cursor:
+        habit_logs = [dict(row) for row in await cursor.fetchall()]
+    async with db.execute("SELECT * FROM mood_entries WHERE user_id = ? AND date >= ?", (user_id, week_ago)) as cursor:
+        mood_entries = [dict(row) for row in await cursor.fetchall()]
+    async with db.execute("SELECT * FROM focus_sessions WHERE user_id = ? AND date >= ?", (user_id, week_ago)) as cursor:
+        focus_sessions = [dict(row) for row in await cursor.fetchall()]
+    async with db.execute("SELECT * FROM habits WHERE user_id = ?", (user_id,)) as cursor:
+        habits = [dict(row) for row in await cursor.fetchall()]
+
+    sleep_focus_map = defaultdict(list)
+    for mood in mood_entries:
+        day_focus = [s["duration_minutes"] for s in focus_sessions if s["date"] == mood["date"]]
+        if day_focus:
+            sleep_focus_map["low" if mood["sleep_hours"] < 6 else "high"].extend(day_focus)
+    habit_streaks = {
+        habit["name"]: len([log for log in habit_logs if log["habit_id"] == habit["id"] and log["completed"]])
+        for habit in habits
+    }
+    days = [week_ago + timedelta(days=i) for i in range(8)]
+    focus_chart_data = [
+        {"date": d.strftime("%Y-%m-%d"), "minutes": sum(s["duration_minutes"] for s in focus_sessions if s["date"] == d)}
+        for d in days
+    ]
+    return sleep_focus_map, habit_streaks, focus_chart_data
+
+
+async def seed_user(db, habit_count, sessions_per_day, today):
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+    await db.execute(
+        "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+        (user_id, "Bench", f"{user_id}@example.com", "x", now)
+    )
+    habit_ids = [uuid.uuid4() for _ in range(habit_count)]
+    await db.executemany(
+        "INSERT INTO habits (id, user_id, name, description, created_at) VALUES (?, ?, ?, '', ?)",
+        [(habit_id, user_id, f"Habit {i}", now) for i, habit_id in enumerate(habit_ids)]
+    )
+    logs, moods, sessions = [], [], []
+    for offset in range(DAYS_OF_HISTORY):
+        day = today - timedelta(days=offset)
+        logs += [(uuid.uuid4(), habit_id, user_id, day, (i + offset) % 3 != 0, "", now)
+                 for i, habit_id in enumerate(habit_ids)]
+        moods.append((uuid.uuid4(), user_id, 3, 3, 5 if offset % 2 else 8, "", day, now))
+        sessions += [(uuid.uuid4(), user_id, "Task", 10 + i % 40, now, now, day, True)
+                     for i in range(sessions_per_day)]
+    await db.executemany(
+        "INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)", logs)
+    await db.executemany(
+        """INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, date, timestamp)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", moods)
+    await db.executemany(
+        """INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date, completed)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", sessions)
+    await db.commit()
+    return user_id
+
+
+async def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main(repeat):
+    pool = server.shards[0].pool
+    await pool.open()
+    await server.init_db(pool)
+    today = datetime.utcnow().date()
+    print(f"{'habits':>7} {'sessions/day':>13} {'raw rows':>9} {'legacy ms':>10} {'current ms':>11}")
+    async with pool.connection() as db:
+        for habit_count, sessions_per_day in SCENARIOS:
+            user_id = await seed_user(db, habit_count, sessions_per_day, today)
+            raw_rows = DAYS_OF_HISTORY * (habit_count + sessions_per_day + 1)
+            legacy_ms = await time_call(lambda: legacy_analytics(db, user_id, today), repeat)
+            start, end = analytics.default_window(today)
+            current_ms = await time_call(
+                lambda: analytics.compute_analytics(db, user_id, start, end, expected_days=analytics.WINDOW_DAYS), repeat)
+            print(f"{habit_count:>7} {sessions_per_day:>13} {raw_rows:>9} {legacy_ms:>10.2f} {current_ms:>11.2f}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args().repeat))
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+How the per-user read endpoints scale with the length of a user's history.
+
+For each history profile (days of data, habits, focus sessions a day), up to
+three years of daily data with 50 habits, generates a database with
+generate_dataset.py and times the endpoints below for one of its users,
+in process over ASGI. It reports the median latency, and the peak Python
+memory allocated while serving one request (from tracemalloc, measured in a
+separate pass so tracing does not skew the timings). The analytics response
+cache is invalidated before every request so the computation itself is
+measured.
+
+Prints a table, optionally writes the numbers as JSON and, when matplotlib
+is installed, plots latency and memory against history size.
+
+    python benchmarks/bench_scaling.py [--repeat 10] [--users 10] [--output scaling.json] [--plot scaling.png]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+WORK_DIR = tempfile.mkdtemp(prefix="pulse-scaling-")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "unused.db")
+
+import httpx  # noqa: E402
+
+from generate_dataset import PASSWORD, generate  # noqa: E402
+import server  # noqa: E402
+from shards import ShardRouter  # noqa: E402
+
+# (days of history, habits, focus sessions a day)
+PROFILES = [
+    (30, 5, 2),
+    (90, 10, 3),
+    (365, 20, 4),
+    (730, 35, 5),
+    (1095, 50, 6),
+]
+
+
+def endpoints(start, end):
+    """(name, path, params) of each measured request; ``walk`` follows the
+    cursor through every page."""
+    year = max(start, end - timedelta(days=server.ANALYTICS_MAX_WINDOW_DAYS - 1))
+    return [
+        ("analytics 7d", "/api/analytics", {}),
+        ("analytics year, weekly", "/api/analytics", {"from": str(year), "to": str(end), "granularity": "week"}),
+        ("habit logs, first page", "/api/habits/logs", {}),
+        ("habit logs, 1000 rows", "/api/habits/logs", {"limit": 1000}),
+        ("habit logs, last 30d", "/api/habits/logs", {"from": str(end - timedelta(days=29)), "limit": 1000}),
+        ("focus, first page", "/api/focus", {}),
+        ("focus, 1000 rows", "/api/focus", {"limit": 1000}),
+        ("habit logs, walk all", "walk", {"limit": 1000}),
+    ]
+
+
+async def measure(db_path, repeat, end, days):
+    # generate() has initialised the file already; startup_db/shutdown_db are
+    # one-offs (shutdown also stops the password hasher), so swap shards by hand
+    server.shards = ShardRouter([server.open_shard(db_path)])
+    await server.shards.open()
+    await server.shards.start_writers()
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://pulse.test") as client:
+            response = await client.post("/api/auth/login", json={"email": "user0@example.com", "password": PASSWORD})
+            response.raise_for_status()
+            body = response.json()
+            headers = {"Authorization": f"Bearer {body['access_token']}"}
+            user_id = server.storage_codecs.parse_uuid(body["user"]["id"])
+
+            async def call(path, params):
+                if path == "walk":
+                    params, size = dict(params), 0
+                    while True:
+                        page = await call("/api/habits/logs", params)
+                        size += len(page.content)
+                        params["cursor"] = page.headers.get(server.NEXT_CURSOR_HEADER)
+                        if not params["cursor"]:
+                            return httpx.Response(200, content=bytes(size))
+                server.analytics_cache.bump(user_id)
+                response = await client.get(path, params=params, headers=headers)
+                response.raise_for_status()
+                return response
+
+            for name, path, params in endpoints(end - timedelta(days=days - 1), end):
+                await call(path, params)  # warm the page cache
+                samples = []
+                for _ in range(repeat):
+                    begin = time.perf_counter()
+                    response = await call(path, params)
+                    samples.append((time.perf_counter() - begin) * 1000)
+                tracemalloc.start()
+                await call(path, params)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[name] = {
+                    "p50_ms": round(statistics.median(samples), 3),
+                    "peak_kib": round(peak / 1024, 1),
+                    "response_kib": round(len(response.content) / 1024, 1),
+                }
+    finally:
+        await server.shards.stop_writers()
+        await server.shards.close()
+    return results
+
+
+def plot(report, path):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print(f"matplotlib is not installed; skipping {path}")
+        return
+    fig, (latency, memory) = plt.subplots(1, 2, figsize=(13, 5))
+    rows = [run["rows_per_user"] for run in report]
+    for name in report[0]["endpoints"]:
+        latency.plot(rows, [run["endpoints"][name]["p50_ms"] for run in report], marker="o", label=name)
+        memory.plot(rows, [run["endpoints"][name]["peak_kib"] for run in report], marker="o", label=name)
+    for axis, label in ((latency, "median latency (ms)"), (memory, "peak allocated per request (KiB)")):
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("rows per user")
+        axis.set_ylabel(label)
+        axis.grid(True, which="both", alpha=0.3)
+    latency.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Wrote {path}")
+
+
+def main(repeat, users, output, plot_path):
+    logging.disable(logging.INFO)
+    end = date.today()
+    report = []
+    for days, habits, focus_per_day in PROFILES:
+        db_path = Path(WORK_DIR) / f"history-{days}d.db"
+        dataset = generate(db_path, users, days, habits, focus_per_day, end=end)
+        rows_per_user = sum(dataset["rows"].values()) // users
+        results = asyncio.run(measure(db_path, repeat, end, days))
+        report.append({"days": days, "habits": habits, "focus_per_day": focus_per_day,
+                       "rows_per_user": rows_per_user, "endpoints": results})
+
+        print(f"\n{days} days, ~{habits} habits, ~{focus_per_day} focus sessions/day: {rows_per_user} rows per user")
+        print(f"{'endpoint':<26} {'p50 ms':>9} {'peak KiB':>10} {'body KiB':>10}")
+        for name, stats in results.items():
+            print(f"{name:<26} {stats['p50_ms']:>9.2f} {stats['peak_kib']:>10.0f} {stats['response_kib']:>10.0f}")
+
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2) + "\n")
+    if plot_path:
+        plot(report, plot_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--users", type=int, default=10, help="users per database, all with the same profile")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--plot", help="write a PNG of latency and memory (needs matplotlib)")
+    args = parser.parse_args()
+    main(args.repeat, args.users, args.output, args.plot)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for the list endpoints.
+
+Seeds a throwaway database with one user's habit logs, reads them back the
+way GET /habits/logs does and times turning the rows into a response body two
+ways: the original path (a HabitLog model per row, validated again through
+``response_model`` and encoded by the stdlib JSON encoder, as FastAPI does)
+and the current ``RowEncoder`` path. Both bodies are checked to be identical.
+
+    python benchmarks/bench_serialization.py [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="pulse-bench-"), "bench.db")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+import server  # noqa: E402
+
+ROW_COUNTS = [1_000, 10_000, 100_000]
+RESPONSE_FIELD = create_response_field(name="Response_get_habit_logs", type_=List[server.HabitLog])
+
+
+async def legacy_body(rows):
+    """What the endpoint did before: models per row, response_model, json.dumps."""
+    logs = [server.HabitLog(**dict(row)) for row in rows]
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=logs)
+    return JSONResponse(content).body
+
+
+async def current_body(rows):
+    return server.habit_log_encoder.response(rows).body
+
+
+async def seed_logs(db, count):
+    user_id = uuid.uuid4()
+    habit_ids = [uuid.uuid4() for _ in range(10)]
+    start = datetime(2020, 1, 1)
+    await db.executemany(
+        "INSERT INTO habits (id, user_id, name, description, created_at) VALUES (?, ?, ?, '', ?)",
+        [(habit_id, user_id, f"Habit {i}", start) for i, habit_id in enumerate(habit_ids)]
+    )
+    await db.executemany(
+        "INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (uuid.uuid4(), habit_ids[i % 10], user_id, (start + timedelta(days=i // 10)).date(),
+             i % 3 != 0, "Felt good today" if i % 4 == 0 else "", start + timedelta(days=i // 10, seconds=i))
+            for i in range(count)
+        ]
+    )
+    await db.commit()
+    return user_id
+
+
+async def time_call(fn, rows, repeat):
+    samples = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        body = await fn(rows)
+        samples.append(time.perf_counter() - begin)
+    return statistics.median(samples), body
+
+
+async def main(repeat):
+    pool = server.shards[0].pool
+    await pool.open()
+    await server.init_db(pool)
+    print(f"{'rows':>8} {'MB':>6} {'legacy ms':>10} {'current ms':>11} {'legacy rows/s':>14} {'current rows/s':>15} {'speedup':>8}")
+    async with pool.connection() as db:
+        for count in ROW_COUNTS:
+            user_id = await seed_logs(db, count)
+            async with db.execute(
+                f"SELECT {server.habit_log_encoder.select} FROM habit_logs WHERE user_id = ? ORDER BY date DESC, id DESC",
+                (user_id,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+
+            legacy_s, legacy = await time_call(legacy_body, rows, repeat)
+            current_s, current = await time_call(current_body, rows, repeat)
+            assert legacy == current, "encoders disagree"
+            print(f"{count:>8} {len(current) / 1e6:>6.1f} {legacy_s * 1000:>10.1f} {current_s * 1000:>11.1f} "
+                  f"{count / legacy_s:>14.0f} {count / current_s:>15.0f} {legacy_s / current_s:>7.1f}x")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args().repeat))
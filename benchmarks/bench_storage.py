@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Storage-size and query-latency report for the compact id/date encoding.
+
+Builds a database in the old text layout (36-character UUID ids, 'YYYY-MM-DD'
+dates, text timestamps), copies it and migrates the copy through
+``server.init_db``, then compares the two: file size after VACUUM, the size
+of every table and index they share (from the ``dbstat`` virtual table) and
+the median latency of the per-user queries the API runs. Compact reads are
+timed twice: as stored, and decoded into ``UUID``/``date``/``datetime`` the way
+the server's connections return them.
+
+    python benchmarks/bench_storage.py [--users 100] [--days 365] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+WORK_DIR = tempfile.mkdtemp(prefix="pulse-bench-")
+LEGACY_PATH = os.path.join(WORK_DIR, "legacy.db")
+os.environ["DB_PATH"] = os.path.join(WORK_DIR, "compact.db")
+
+import server  # noqa: E402
+
+HABITS_PER_USER = 5
+FOCUS_PER_DAY = 2
+
+# The text layout as it was before the compact encoding, with the same indexes
+LEGACY_SCHEMA = """
+    CREATE TABLE users (
+        id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE habits (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, name TEXT NOT NULL, description TEXT,
+        frequency TEXT DEFAULT 'daily', color TEXT DEFAULT '#3f8cff', icon TEXT DEFAULT 'checkmark-circle',
+        target_per_week INTEGER DEFAULT 7, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        change_seq INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE habit_logs (
+        id TEXT PRIMARY KEY, habit_id TEXT NOT NULL, user_id TEXT NOT NULL, date TEXT NOT NULL,
+        completed BOOLEAN DEFAULT 0, notes TEXT, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        change_seq INTEGER NOT NULL DEFAULT 0, UNIQUE(habit_id, date)
+    );
+    CREATE TABLE mood_entries (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, mood_level INTEGER NOT NULL, energy_level INTEGER NOT NULL,
+        sleep_hours REAL NOT NULL, notes TEXT, date TEXT NOT NULL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        change_seq INTEGER NOT NULL DEFAULT 0, UNIQUE(user_id, date)
+    );
+    CREATE TABLE focus_sessions (
+        id TEXT PRIMARY KEY, user_id TEXT NOT NULL, task_name TEXT NOT NULL, duration_minutes INTEGER NOT NULL,
+        start_time TIMESTAMP NOT NULL, end_time TIMESTAMP NOT NULL, date TEXT NOT NULL, completed BOOLEAN DEFAULT 1,
+        change_seq INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX idx_habits_user ON habits (user_id, created_at);
+    CREATE INDEX idx_habit_logs_user_date ON habit_logs (user_id, date, id);
+    CREATE INDEX idx_habit_logs_user_habit_date ON habit_logs (user_id, habit_id, date, id);
+    CREATE INDEX idx_mood_entries_user_date ON mood_entries (user_id, date, id);
+    CREATE INDEX idx_focus_sessions_user_start ON focus_sessions (user_id, start_time, id);
+    CREATE INDEX idx_focus_sessions_user_date ON focus_sessions (user_id, date, duration_minutes);
+"""
+
+# (name, SQL, parameter names) for the reads the API issues most
+QUERIES = (
+    ("habit logs page", "SELECT id, habit_id, user_id, date, completed, notes, timestamp FROM habit_logs "
+     "WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date DESC, id DESC LIMIT 101", ("user", "from", "to")),
+    ("habit logs by habit", "SELECT id, habit_id, user_id, date, completed, notes, timestamp FROM habit_logs "
+     "WHERE user_id = ? AND habit_id = ? ORDER BY date DESC, id DESC LIMIT 101", ("user", "habit")),
+    ("mood page", "SELECT id, user_id, mood_level, energy_level, sleep_hours, notes, date, timestamp "
+     "FROM mood_entries WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date DESC, id DESC LIMIT 101",
+     ("user", "from", "to")),
+    ("focus page", "SELECT id, user_id, task_name, duration_minutes, start_time, end_time, date, completed "
+     "FROM focus_sessions WHERE user_id = ? ORDER BY start_time DESC, id DESC LIMIT 101", ("user",)),
+    ("completions per habit", "SELECT habit_id, COUNT(*) FROM habit_logs "
+     "WHERE user_id = ? AND date >= ? AND date <= ? AND completed GROUP BY habit_id", ("user", "from", "to")),
+    ("log upsert lookup", "SELECT id FROM habit_logs WHERE habit_id = ? AND date = ?", ("habit", "to")),
+)
+
+
+def build_legacy(users, days):
+    rng = random.Random(7)
+    conn = sqlite3.connect(LEGACY_PATH)
+    conn.executescript(LEGACY_SCHEMA)
+    start = date.today() - timedelta(days=days)
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    samples = []
+    for u in range(users):
+        user_id = str(uuid.uuid4())
+        conn.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                     (user_id, f"User {u}", f"user{u}@example.com", "x" * 60, str(now)))
+        habit_ids = [str(uuid.uuid4()) for _ in range(HABITS_PER_USER)]
+        conn.executemany(
+            "INSERT INTO habits (id, user_id, name, description, created_at) VALUES (?, ?, ?, '', ?)",
+            [(habit_id, user_id, f"Habit {i}", str(now)) for i, habit_id in enumerate(habit_ids)]
+        )
+        logs, moods, sessions = [], [], []
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).strftime("%Y-%m-%d")
+            stamp = str(now + timedelta(days=offset, microseconds=rng.randrange(10 ** 6)))
+            logs += [(str(uuid.uuid4()), habit_id, user_id, day, rng.random() < 0.7, "", stamp)
+                     for habit_id in habit_ids]
+            moods.append((str(uuid.uuid4()), user_id, rng.randint(1, 5), rng.randint(1, 5), 7.5, "", day, stamp))
+            sessions += [(str(uuid.uuid4()), user_id, "Deep work", 25, stamp, stamp, day, True)
+                         for _ in range(FOCUS_PER_DAY)]
+        conn.executemany("INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", logs)
+        conn.executemany("INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, "
+                         "date, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", moods)
+        conn.executemany("INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, "
+                         "end_time, date, completed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sessions)
+        samples.append({
+            "user": user_id, "habit": habit_ids[0],
+            "from": (start + timedelta(days=days // 2)).strftime("%Y-%m-%d"),
+            "to": (start + timedelta(days=days // 2 + 30)).strftime("%Y-%m-%d"),
+        })
+    conn.commit()
+    conn.close()
+    return samples
+
+
+def object_sizes(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+        return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+    finally:
+        conn.close()
+
+
+def median_ms(conn, sql, param_sets, repeat):
+    samples = []
+    for _ in range(repeat):
+        for params in param_sets:
+            begin = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(samples)
+
+
+def compact_params(sample):
+    return {
+        "user": uuid.UUID(sample["user"]), "habit": uuid.UUID(sample["habit"]),
+        "from": date.fromisoformat(sample["from"]), "to": date.fromisoformat(sample["to"]),
+    }
+
+
+async def migrate():
+    pool = server.shards[0].pool
+    await pool.open()
+    begin = time.perf_counter()
+    await server.init_db(pool)
+    elapsed = time.perf_counter() - begin
+    await pool.close()
+    return elapsed
+
+
+def main(users, days, repeat):
+    samples = build_legacy(users, days)
+    shutil.copy(LEGACY_PATH, server.DB_PATH)
+    migrate_s = asyncio.run(migrate())
+    print(f"{users} users x {days} days; migration took {migrate_s:.2f}s\n")
+
+    legacy_sizes, compact_sizes = object_sizes(LEGACY_PATH), object_sizes(server.DB_PATH)
+    print(f"{'table / index':<34} {'text KiB':>9} {'compact KiB':>12} {'saved':>6}")
+    for name in sorted(legacy_sizes.keys() & compact_sizes.keys()):
+        before, after = legacy_sizes[name], compact_sizes[name]
+        print(f"{name:<34} {before / 1024:>9.0f} {after / 1024:>12.0f} {1 - after / before:>6.0%}")
+    shared_before = sum(legacy_sizes[name] for name in legacy_sizes.keys() & compact_sizes.keys())
+    shared_after = sum(compact_sizes[name] for name in legacy_sizes.keys() & compact_sizes.keys())
+    print(f"{'all of the above':<34} {shared_before / 1024:>9.0f} {shared_after / 1024:>12.0f} "
+          f"{1 - shared_after / shared_before:>6.0%}")
+    print(f"{'file after VACUUM':<34} {os.path.getsize(LEGACY_PATH) / 1024:>9.0f} "
+          f"{os.path.getsize(server.DB_PATH) / 1024:>12.0f}   (compact also holds rollups, search and sync)\n")
+
+    legacy = sqlite3.connect(LEGACY_PATH)
+    compact = sqlite3.connect(server.DB_PATH)
+    decoded = sqlite3.connect(server.DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+    print(f"{'query':<24} {'text ms':>8} {'compact ms':>11} {'decoded ms':>11}")
+    for name, sql, keys in QUERIES:
+        text_params = [tuple(s[k] for k in keys) for s in samples]
+        params = [tuple(compact_params(s)[k] for k in keys) for s in samples]
+        before = median_ms(legacy, sql, text_params, repeat)
+        after = median_ms(compact, sql, params, repeat)
+        after_decoded = median_ms(decoded, sql, params, repeat)
+        print(f"{name:<24} {before:>8.3f} {after:>11.3f} {after_decoded:>11.3f}")
+    for conn in (legacy, compact, decoded):
+        conn.close()
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.users, args.days, args.repeat)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Write-throughput benchmark for habit-log upserts.
+
+Submits the same stream of concurrent habit-log writes (a mix of new days and
+rewrites of existing ones) through the group-commit writer twice: once with
+the original SELECT / UPDATE-or-INSERT / SELECT sequence and once with the
+single ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` statement, and
+reports writes per second and the resulting row counts.
+
+    python benchmarks/bench_upserts.py [--writes 5000] [--concurrency 64]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="pulse-bench-"), "bench.db")
+
+import server  # noqa: E402
+from write_queue import GroupCommitWriter  # noqa: E402
+
+HABITS_PER_USER = 5
+DAYS = 30
+
+
+def legacy_write(user_id, habit_id, day, completed):
+    """The pre-upsert log_habit: check, then update or insert, then read back."""
+    async def write(db):
+        async with db.execute(
+            "SELECT * FROM habit_logs WHERE habit_id = ? AND date = ?", (habit_id, day)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row:
+            await db.execute("UPDATE habit_logs SET completed = ?, notes = ? WHERE id = ?", (completed, "", row["id"]))
+            log_id = row["id"]
+        else:
+            log_id = uuid.uuid4()
+            await db.execute(
+                """INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (log_id, habit_id, user_id, day, completed, "", datetime.utcnow())
+            )
+        async with db.execute("SELECT * FROM habit_logs WHERE id = ?", (log_id,)) as cursor:
+            return dict(await cursor.fetchone())
+    return write
+
+
+def upsert_write(user_id, habit_id, day, completed):
+    """The current log_habit statement."""
+    async def write(db):
+        async with db.execute(
+            server.HABIT_LOG_UPSERT + " RETURNING id, habit_id, user_id, date, completed, notes, timestamp",
+            (uuid.uuid4(), day, completed, "", datetime.utcnow(), habit_id, user_id)
+        ) as cursor:
+            return dict(await cursor.fetchone())
+    return write
+
+
+async def seed_habits(db, users):
+    habits = []
+    now = datetime.utcnow()
+    for _ in range(users):
+        user_id = uuid.uuid4()
+        await db.execute(
+            "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, "Bench", f"{user_id}@example.com", "x", now)
+        )
+        for i in range(HABITS_PER_USER):
+            habit_id = uuid.uuid4()
+            await db.execute(
+                "INSERT INTO habits (id, user_id, name, description, created_at) VALUES (?, ?, ?, '', ?)",
+                (habit_id, user_id, f"Habit {i}", now)
+            )
+            habits.append((user_id, habit_id))
+    await db.commit()
+    return habits
+
+
+async def run(make_write, workload, concurrency):
+    writer = GroupCommitWriter(server.shards[0].pool, max_batch=server.WRITE_BATCH_MAX_SIZE,
+                               max_delay_ms=server.WRITE_BATCH_MAX_DELAY_MS, max_depth=len(workload))
+    await writer.start()
+    queue = iter(workload)
+
+    async def worker():
+        for args in queue:
+            await writer.submit(make_write(*args))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    await writer.stop()
+    return elapsed, stats
+
+
+async def main(writes, concurrency, users):
+    pool = server.shards[0].pool
+    await pool.open()
+    await server.init_db(pool)
+    today = datetime.utcnow().date()
+    days = [today - timedelta(days=i) for i in range(DAYS)]
+
+    print(f"{'variant':>8} {'writes':>7} {'seconds':>8} {'writes/s':>9} {'batches':>8} {'rows':>6}")
+    for name, make_write in (("legacy", legacy_write), ("upsert", upsert_write)):
+        async with pool.connection() as db:
+            await db.execute("DELETE FROM habit_logs")
+            await db.commit()
+            habits = await seed_habits(db, users)
+        rng = random.Random(42)
+        workload = [(*rng.choice(habits), rng.choice(days), rng.random() < 0.7) for _ in range(writes)]
+
+        elapsed, stats = await run(make_write, workload, concurrency)
+        async with pool.connection() as db:
+            async with db.execute("SELECT COUNT(*) FROM habit_logs") as cursor:
+                rows = (await cursor.fetchone())[0]
+        expected_rows = len({(habit_id, day) for _, habit_id, day, _ in workload})
+        assert rows == expected_rows, f"{name}: {rows} rows, expected {expected_rows}"
+        print(f"{name:>8} {writes:>7} {elapsed:>8.2f} {writes / elapsed:>9.0f} "
+              f"{stats['batches_committed']:>8} {rows:>6}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.writes, args.concurrency, args.users))
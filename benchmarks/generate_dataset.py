@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic Pulse dataset, written straight into SQLite.
+
+Each user gets a varying number of habits (around ``--habits``) created over
+the first part of their history, daily habit logs with a per-habit adherence
+that dips at weekends, a mood entry on most days drifting as a random walk,
+and a Poisson-distributed number of focus sessions a day (around
+``--focus-per-day``). Users are generated from ``(seed, user index)``, so the
+same arguments always give the same rows and a larger ``--users`` only adds
+users. Every user's password is ``PASSWORD``; emails are
+``user<index>@example.com``.
+
+Rows are bulk-inserted into bare tables and ``server.init_db`` then adds the
+indexes, triggers, rollups and search index the way it does for an existing
+database. With ``--shards N`` users are split over the files the server
+opens with DB_SHARD_COUNT=N.
+
+    python benchmarks/generate_dataset.py OUT.db [--users 1000] [--days 365] [--habits 8]
+                                          [--focus-per-day 2] [--seed 1] [--end YYYY-MM-DD] [--shards 1]
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from storage_codecs import date_to_day  # noqa: E402
+from shards import shard_index, shard_paths  # noqa: E402
+
+PASSWORD = "PulseBench123!"
+# bcrypt of PASSWORD at cost 4 with a fixed salt, so files are reproducible;
+# logins upgrade it to the server's cost as they would any old hash
+PASSWORD_HASH = "$2b$04$PulseBenchSaltPulseBeOTcTdDUrEXrqwlSuR8hRhm6oRYXW1lvK"
+USERS_PER_COMMIT = 200
+
+MINUTE_US = 60 * 1000000
+HOUR_US = 60 * MINUTE_US
+DAY_US = 24 * HOUR_US
+
+HABIT_NAMES = ("Meditate", "Read", "Walk", "Stretch", "Journal", "Drink water", "No sugar", "Run", "Floss",
+               "Practice guitar", "Study Spanish", "Cold shower", "Call family", "Plan tomorrow", "Cook dinner")
+TASKS = ("Deep work", "Reading", "Email", "Planning", "Writing", "Code review", "Study", "Design")
+NOTES = ("", "", "", "", "Felt good today", "Hard to start", "Great session", "Tired", "Back on track")
+
+
+def new_id(rng) -> bytes:
+    """A random version 4 UUID, as the 16 bytes stored in id columns."""
+    value = rng.getrandbits(128) & ~(0xF << 76) & ~(0x3 << 62) | (0x4 << 76) | (0x2 << 62)
+    return value.to_bytes(16, "big")
+
+
+def poisson(rng, mean):
+    # Knuth's method; fine for the small means used here
+    limit, count, product = math.exp(-mean), 0, rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+INSERTS = {
+    "users": "INSERT INTO users (id, name, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+    "habits": "INSERT INTO habits (id, user_id, name, description, frequency, color, icon, target_per_week, "
+              "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "habit_logs": "INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes, timestamp) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "mood_entries": "INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, date, "
+                    "timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "focus_sessions": "INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, "
+                      "date, completed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+
+def user_rows(seed, index, end, days, habits, focus_per_day):
+    """All rows of one user, by table, already in the stored encoding (see
+    storage_codecs): bulk loading skips the per-value adapters that way."""
+    rng = random.Random(f"{seed}:{index}")
+    user_id = new_id(rng)
+    start = date_to_day(end) - days + 1
+    joined = start * DAY_US + rng.randrange(DAY_US)
+    rows = {table: [] for table in INSERTS}
+    rows["users"].append((user_id, f"User {index}", f"user{index}@example.com", PASSWORD_HASH, joined))
+
+    habit_count = max(1, round(rng.gauss(habits, habits / 4)))
+    for h in range(habit_count):
+        habit_id = new_id(rng)
+        # Most habits exist from the start; the rest are added over the first half
+        first_day = 0 if h < habit_count * 0.6 else rng.randrange(max(1, days // 2))
+        created_at = joined + first_day * DAY_US + rng.randrange(HOUR_US)
+        rows["habits"].append((habit_id, user_id, rng.choice(HABIT_NAMES), rng.choice(NOTES), "daily",
+                               "#3f8cff", "checkmark-circle", rng.choice((3, 5, 7, 7)), created_at))
+        adherence = rng.uniform(0.3, 0.95)
+        for offset in range(first_day, days):
+            if rng.random() < 0.15:
+                continue  # not logged that day
+            day = start + offset
+            weekend = 0.15 if (day + 3) % 7 >= 5 else 0  # day 0 was a Thursday
+            rows["habit_logs"].append((new_id(rng), habit_id, user_id, day, rng.random() < adherence - weekend,
+                                       rng.choice(NOTES), created_at + (offset - first_day) * DAY_US))
+
+    mood = rng.uniform(2, 4)
+    for offset in range(days):
+        mood = min(5.0, max(1.0, mood + rng.gauss(0, 0.6)))
+        if rng.random() < 0.2:
+            continue
+        day = start + offset
+        stamp = day * DAY_US + 21 * HOUR_US + rng.randrange(2 * HOUR_US)
+        rows["mood_entries"].append((new_id(rng), user_id, round(mood), min(5, max(1, round(mood + rng.gauss(0, 1)))),
+                                     round(rng.gauss(7.2, 1.0), 1), rng.choice(NOTES), day, stamp))
+
+    for offset in range(days):
+        day = start + offset
+        for _ in range(poisson(rng, focus_per_day)):
+            begin = day * DAY_US + rng.randrange(7 * 60, 22 * 60) * MINUTE_US
+            minutes = rng.choice((15, 25, 25, 25, 45, 50, 90))
+            rows["focus_sessions"].append((new_id(rng), user_id, rng.choice(TASKS), minutes, begin,
+                                           begin + minutes * MINUTE_US, day, rng.random() < 0.9))
+    return uuid.UUID(bytes=user_id), rows
+
+
+async def finish(paths):
+    for path in paths:
+        pool = server.open_shard(path).pool
+        await pool.open()
+        try:
+            await server.init_db(pool)
+        finally:
+            await pool.close()
+
+
+def generate(db_path: Path, users: int, days: int, habits: int = 8, focus_per_day: float = 2, seed: int = 1,
+             end: date = None, shards: int = 1, first_user: int = 0) -> dict:
+    """Write users ``first_user`` .. ``first_user + users - 1`` into new files.
+
+    Returns the row count of each table and the ids of the generated users,
+    in order.
+    """
+    end = end or date.today()
+    paths = shard_paths(db_path, shards)
+    existing = [path for path in paths if path.exists()]
+    if existing:
+        raise FileExistsError(f"Refusing to overwrite {existing[0]}")
+
+    conns = []
+    for path in paths:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")  # 256 MiB: ids are random, so inserts hit the whole index
+        for table, schema in server.TABLE_SCHEMAS.items():
+            conn.execute(schema)
+        conns.append(conn)
+
+    counts = {table: 0 for table in INSERTS}
+    user_ids = []
+    for index in range(first_user, first_user + users):
+        user_id, rows = user_rows(seed, index, end, days, habits, focus_per_day)
+        conn = conns[shard_index(user_id, shards)]
+        for table, sql in INSERTS.items():
+            conn.executemany(sql, rows[table])
+            counts[table] += len(rows[table])
+        user_ids.append(user_id)
+        if len(user_ids) % USERS_PER_COMMIT == 0:
+            for conn in conns:
+                conn.commit()
+    for conn in conns:
+        conn.commit()
+        conn.close()
+
+    asyncio.run(finish(paths))
+    return {"rows": counts, "user_ids": user_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", type=Path, help="database file to create (shard 0 when sharded)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="days of history per user")
+    parser.add_argument("--habits", type=int, default=8, help="mean habits per user")
+    parser.add_argument("--focus-per-day", type=float, default=2, help="mean focus sessions per day")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="last day of history (default today)")
+    parser.add_argument("--shards", type=int, default=1)
+    args = parser.parse_args()
+
+    began = time.perf_counter()
+    result = generate(args.output, args.users, args.days, args.habits, args.focus_per_day, args.seed,
+                      args.end, args.shards)
+    elapsed = time.perf_counter() - began
+    total = sum(result["rows"].values())
+    print(", ".join(f"{count} {table}" for table, count in result["rows"].items()))
+    print(f"{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s); password for every user: {PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load test for the Pulse API with per-endpoint latency percentiles.
+
+Registers a set of users with some history, then has ``--concurrency``
+workers send a weighted mix of reads and writes as fast as responses come
+back, for ``--duration`` seconds after a ``--warmup``. By default the app is
+driven in process over ASGI against a throwaway database (server settings
+come from the environment as usual, e.g. DB_SHARD_COUNT or HOT_TIER_DAYS);
+with ``--url`` a running server is tested instead, e.g. a local
+``uvicorn server:app``.
+
+The report is JSON: overall and per-endpoint request counts, errors,
+throughput and p50/p95/p99 latency. Pass a previous report as ``--baseline``
+to also print how each endpoint changed.
+
+    python benchmarks/load_test.py [--mix balanced] [--concurrency 32] [--duration 10]
+                                   [--users 20] [--url http://127.0.0.1:8000]
+                                   [--output report.json] [--baseline before.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+SEED_DAYS = 30
+HABITS_PER_USER = 5
+TASKS = ("Deep work", "Reading", "Email", "Planning")
+
+# Relative weights of each operation, by mix
+MIXES = {
+    "read-heavy": {
+        "GET /api/habits": 10, "GET /api/habits/logs": 25, "GET /api/mood": 15, "GET /api/focus": 10,
+        "GET /api/analytics": 15, "GET /api/sync": 10, "GET /api/search": 5,
+        "POST /api/habits/log": 6, "POST /api/mood": 2, "POST /api/focus": 2,
+    },
+    "balanced": {
+        "GET /api/habits": 5, "GET /api/habits/logs": 15, "GET /api/mood": 10, "GET /api/focus": 5,
+        "GET /api/analytics": 10, "GET /api/sync": 5,
+        "POST /api/habits/log": 30, "POST /api/mood": 10, "POST /api/focus": 10,
+    },
+    "write-heavy": {
+        "GET /api/habits/logs": 5, "GET /api/analytics": 5,
+        "POST /api/habits/log": 60, "POST /api/mood": 15, "POST /api/focus": 10, "POST /api/habits/log/batch": 5,
+    },
+}
+
+
+class User:
+    def __init__(self, headers, habit_ids):
+        self.headers = headers
+        self.habit_ids = habit_ids
+        self.sync_cursor = 0
+
+
+def recent_day(rng, days=7):
+    return str(date.today() - timedelta(days=rng.randrange(days)))
+
+
+def build_request(op, user, rng):
+    """(method, path, keyword arguments) for one request of ``op``."""
+    method, path = op.split(" ", 1)
+    if op == "GET /api/habits/logs":
+        return method, path, {"params": {"from": recent_day(rng, 30)}}
+    if op == "GET /api/mood":
+        return method, path, {"params": {"from": recent_day(rng, 30)}}
+    if op == "GET /api/focus":
+        return method, path, {"params": {"limit": 50}}
+    if op == "GET /api/analytics":
+        if rng.random() < 0.75:
+            return method, path, {}  # the default last-7-days view
+        return method, path, {"params": {"from": str(date.today() - timedelta(days=90)), "to": str(date.today()),
+                                         "granularity": "week"}}
+    if op == "GET /api/sync":
+        return method, path, {"params": {"since": user.sync_cursor}}
+    if op == "GET /api/search":
+        return method, path, {"params": {"q": rng.choice(("read", "work", "habit"))}}
+    if op == "POST /api/habits/log":
+        return method, path, {"json": {"habit_id": rng.choice(user.habit_ids), "date": recent_day(rng),
+                                       "completed": rng.random() < 0.7}}
+    if op == "POST /api/habits/log/batch":
+        return method, path, {"json": [{"habit_id": habit_id, "date": recent_day(rng), "completed": True}
+                                       for habit_id in user.habit_ids]}
+    if op == "POST /api/mood":
+        return method, path, {"json": {"mood_level": rng.randint(1, 5), "energy_level": rng.randint(1, 5),
+                                       "sleep_hours": rng.choice((6, 7, 7.5, 8)), "date": recent_day(rng)}}
+    if op == "POST /api/focus":
+        return method, path, {"json": {"task_name": rng.choice(TASKS), "duration_minutes": rng.choice((25, 50)),
+                                       "date": recent_day(rng)}}
+    return method, path, {}
+
+
+async def seed_user(client, run_id, index, rng):
+    response = await client.post("/api/auth/register", json={
+        "name": f"Load {index}", "email": f"load-{run_id}-{index}@example.com", "password": "LoadTest123!",
+    })
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    habit_ids = []
+    for i in range(HABITS_PER_USER):
+        response = await client.post("/api/habits", json={"name": f"Habit {i}"}, headers=headers)
+        response.raise_for_status()
+        habit_ids.append(response.json()["id"])
+
+    days = [str(date.today() - timedelta(days=offset)) for offset in range(SEED_DAYS)]
+    requests = [
+        ("/api/habits/log/batch", [{"habit_id": habit_id, "date": day, "completed": rng.random() < 0.7}
+                                   for day in days for habit_id in habit_ids]),
+        ("/api/mood/batch", [{"mood_level": rng.randint(1, 5), "energy_level": rng.randint(1, 5),
+                              "sleep_hours": 7, "date": day} for day in days]),
+        ("/api/focus/batch", [{"task_name": rng.choice(TASKS), "duration_minutes": 25, "date": day}
+                              for day in days for _ in range(2)]),
+    ]
+    for path, body in requests:
+        response = await client.post(path, json=body, headers=headers)
+        response.raise_for_status()
+    return User(headers, habit_ids)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(samples, errors, statuses, elapsed):
+    ordered = sorted(samples)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else None,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": ordered[-1] if ordered else None,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def run_load(client, users, mix, concurrency, duration, warmup, seed):
+    ops, weights = zip(*MIXES[mix].items())
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    statuses = defaultdict(lambda: defaultdict(int))
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    stop_at = measure_from + duration
+
+    async def worker(index):
+        rng = random.Random(f"{seed}-{index}")
+        while loop.time() < stop_at:
+            op = rng.choices(ops, weights)[0]
+            user = rng.choice(users)
+            method, path, kwargs = build_request(op, user, rng)
+            begin = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=user.headers, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed_ms = round((time.perf_counter() - begin) * 1000, 3)
+            if op == "GET /api/sync" and status == 200:
+                user.sync_cursor = response.json()["cursor"]
+            if loop.time() < measure_from:
+                continue
+            samples[op].append(elapsed_ms)
+            statuses[op][str(status)] += 1
+            if not isinstance(status, int) or status >= 400:
+                errors[op] += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = loop.time() - measure_from
+    all_statuses = defaultdict(int)
+    for op_statuses in statuses.values():
+        for status, count in op_statuses.items():
+            all_statuses[status] += count
+    return {
+        "overall": summarize([s for op in samples for s in samples[op]], sum(errors.values()), all_statuses, elapsed),
+        "endpoints": {op: summarize(samples[op], errors[op], statuses[op], elapsed) for op in sorted(samples)},
+    }
+
+
+def compare(report, baseline):
+    """Print how each endpoint moved against a previous report."""
+    print(f"{'endpoint':<28} {'rps':>14} {'p50 ms':>18} {'p99 ms':>18}", file=sys.stderr)
+    rows = [("overall", report["overall"], baseline.get("overall"))]
+    rows += [(op, stats, baseline.get("endpoints", {}).get(op)) for op, stats in report["endpoints"].items()]
+    for name, now, before in rows:
+        if not before:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p99_ms"):
+            old, new = before.get(key), now.get(key)
+            change = f"{(new - old) / old:+.0%}" if old and new is not None else "n/a"
+            cells.append(f"{old}->{new} {change}")
+        print(f"{name:<28} {cells[0]:>14} {cells[1]:>18} {cells[2]:>18}", file=sys.stderr)
+
+
+async def main(args):
+    # The server configures INFO logging, which would log every request made
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    in_process = args.url is None
+    if in_process:
+        work_dir = tempfile.mkdtemp(prefix="pulse-load-")
+        os.environ["DB_PATH"] = os.path.join(work_dir, "load.db")
+        os.environ.setdefault("BCRYPT_ROUNDS", "4")
+        # Each simulated user sends far more than a real client would
+        os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+        import server
+        await server.startup_db()
+        transport = httpx.ASGITransport(app=server.app)
+        base_url = "http://pulse.test"
+    else:
+        transport, base_url = None, args.url.rstrip("/")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60, limits=limits) as client:
+        rng = random.Random(args.seed)
+        run_id = uuid.uuid4().hex[:8]
+        seed_began = time.perf_counter()
+        users = [await seed_user(client, run_id, i, rng) for i in range(args.users)]
+        seed_s = time.perf_counter() - seed_began
+        result = await run_load(client, users, args.mix, args.concurrency, args.duration, args.warmup, args.seed)
+
+    if in_process:
+        await server.shutdown_db()
+
+    report = {
+        "config": {
+            "target": args.url or "in-process",
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "users": args.users,
+            "seed": args.seed,
+            "seed_history_days": SEED_DAYS,
+            "seeding_s": round(seed_s, 2),
+        },
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        compare(report, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server; default drives the app in process")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="balanced")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of load before measuring")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    asyncio.run(main(parser.parse_args()))
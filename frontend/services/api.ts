@@ -36,6 +36,22 @@ api.interceptors.response.use(
 
 export default api;
 
+// List endpoints return one page at a time, with the cursor for the next
+// page in X-Next-Cursor; this fetches every page into one response
+const PAGE_LIMIT = 1000;
+
+const getAllPages = async (path: string, params: Record<string, any> = {}) => {
+  let response = await api.get(path, { params: { ...params, limit: PAGE_LIMIT } });
+  const data = [...response.data];
+  let cursor = response.headers['x-next-cursor'];
+  while (cursor) {
+    response = await api.get(path, { params: { ...params, limit: PAGE_LIMIT, cursor } });
+    data.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  }
+  return { ...response, data };
+};
+
 // Auth API
 export const authAPI = {
   register: (name: string, email: string, password: string) =>
@@ -50,19 +66,19 @@ export const habitsAPI = {
   getAll: () => api.get('/habits'),
   create: (data: any) => api.post('/habits', data),
   log: (data: any) => api.post('/habits/log', data),
-  getLogs: (habitId?: string) => 
-    api.get('/habits/logs', { params: habitId ? { habit_id: habitId } : {} }),
+  getLogs: (habitId?: string) =>
+    getAllPages('/habits/logs', habitId ? { habit_id: habitId } : {}),
 };
 
 // Mood API
 export const moodAPI = {
-  getAll: () => api.get('/mood'),
+  getAll: () => getAllPages('/mood'),
   create: (data: any) => api.post('/mood', data),
 };
 
 // Focus API
 export const focusAPI = {
-  getAll: () => api.get('/focus'),
+  getAll: () => getAllPages('/focus'),
   create: (data: any) => api.post('/focus', data),
 };
 
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server reads its configuration at import time. Always a fresh file, never
+# an inherited DB_PATH or the checked-in backend/pulse_app.db
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="pulse-test-"), "pulse_test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Two shards, so every test also exercises routing users to their file
+os.environ.setdefault("DB_SHARD_COUNT", "2")
+# Tests fire hundreds of requests as one user; test_admission turns it on
+os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(server.app) as c:
+        yield c
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post("/api/auth/register", json={
+        "name": "Test User",
+        "email": f"user-{uuid.uuid4().hex[:12]}@example.com",
+        "password": "SecurePass123!",
+    })
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
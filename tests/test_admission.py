@@ -0,0 +1,61 @@
+import uuid
+
+import server
+from admission import TokenBuckets, endpoint_class
+
+
+def register(client):
+    response = client.post("/api/auth/register", json={
+        "name": "Busy", "email": f"busy-{uuid.uuid4().hex[:12]}@example.com", "password": "pw",
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_each_user_is_rate_limited_on_their_own(client, monkeypatch):
+    monkeypatch.setattr(server.admission, "buckets", TokenBuckets(rate=0.5, burst=3))
+    busy, other = register(client), register(client)
+
+    assert [client.get("/api/habits", headers=busy).status_code for _ in range(4)] == [200, 200, 200, 429]
+    limited = client.get("/api/analytics", headers=busy)
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "2"
+
+    assert client.get("/api/habits", headers=other).status_code == 200
+    # Health checks and requests without a valid token draw no tokens
+    assert client.get("/api/health").status_code == 200
+    assert client.get("/api/habits", headers={"Authorization": "Bearer forged"}).status_code == 401
+    assert server.admission.stats()["rate_limited"]["reads"] >= 1
+
+
+def test_endpoint_classes_over_capacity_are_shed(client, auth_headers, monkeypatch):
+    monkeypatch.setitem(server.admission.limits, "analytics", 0)
+
+    response = client.get("/api/analytics", headers=auth_headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Other classes are unaffected
+    assert client.get("/api/habits", headers=auth_headers).status_code == 200
+    assert server.admission.stats()["over_capacity"]["analytics"] >= 1
+    assert 'pulse_admission_rejections_total{class="analytics",reason="over_capacity"}' in client.get("/metrics").text
+
+
+def test_cached_tokens_are_not_decoded_again(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server.admission, "buckets", TokenBuckets(rate=10, burst=10))
+    client.get("/api/habits", headers=auth_headers)  # caches the token
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("token decoded again")
+
+    monkeypatch.setattr(server.jwt, "decode", no_decode)
+    assert client.get("/api/habits", headers=auth_headers).status_code == 200
+
+
+def test_rejections_are_labelled_with_their_route(client, auth_headers, monkeypatch):
+    monkeypatch.setitem(server.admission.limits, "auth", 0)
+    # /auth/me does no hashing, so it is an ordinary read
+    assert endpoint_class("GET", "/api/auth/me") == "reads"
+    assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+    assert client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "pw"}).status_code == 503
+
+    metrics = client.get("/metrics").text
+    assert 'pulse_http_request_duration_seconds_count{method="POST",route="/api/auth/login",status="503"}' in metrics
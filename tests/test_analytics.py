@@ -0,0 +1,31 @@
+import server
+
+
+def test_conditional_analytics_requests_skip_the_database(client, auth_headers, monkeypatch):
+    first = client.get("/api/analytics", headers=auth_headers)
+    assert first.status_code == 200
+
+    def no_transaction(user_id):
+        raise AssertionError("opened a transaction")
+
+    monkeypatch.setattr(server, "user_transaction", no_transaction)
+    cached = client.get("/api/analytics", headers=auth_headers)
+    assert cached.content == first.content
+    not_modified = client.get("/api/analytics", headers={**auth_headers, "If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+
+
+def test_daily_mood_points_keep_integer_levels(client, auth_headers):
+    for day, mood in (("2026-02-02", 3), ("2026-02-03", 4)):
+        client.post("/api/mood", json={"mood_level": mood, "energy_level": 2, "sleep_hours": 7, "date": day},
+                    headers=auth_headers)
+    params = {"from": "2026-02-02", "to": "2026-02-08"}
+
+    daily = client.get("/api/analytics", params=params, headers=auth_headers).json()["mood_chart_data"]
+    assert daily == [{"date": "2026-02-02", "mood": 3, "energy": 2}, {"date": "2026-02-03", "mood": 4, "energy": 2}]
+    assert all(isinstance(point["mood"], int) for point in daily)
+
+    weekly = client.get("/api/analytics", params={**params, "granularity": "week"}, headers=auth_headers).json()
+    assert weekly["mood_chart_data"] == [{"date": "2026-02-02", "mood": 3.5, "energy": 2.0}]
+
+    assert client.get("/api/analytics", params={"from": "2026-02-30"}, headers=auth_headers).status_code == 400
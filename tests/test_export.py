@@ -0,0 +1,27 @@
+import csv
+import io
+import json
+
+import server
+
+
+def test_export_streams_every_record_in_chunks(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_CHUNK_SIZE", 2)
+    habit = client.post("/api/habits", json={"name": "Walk, then \"rest\""}, headers=auth_headers).json()
+    for day in ("2026-05-01", "2026-05-02", "2026-05-03"):
+        client.post("/api/habits/log", json={"habit_id": habit["id"], "date": day, "completed": True}, headers=auth_headers)
+        client.post("/api/focus", json={"task_name": "Deep work", "duration_minutes": 30, "date": day}, headers=auth_headers)
+    client.post("/api/mood", json={"mood_level": 4, "energy_level": 3, "sleep_hours": 8, "date": "2026-05-01"}, headers=auth_headers)
+
+    response = client.get("/api/export", params={"format": "ndjson"}, headers=auth_headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["type"] for r in records] == ["habit"] + ["habit_log"] * 3 + ["mood_entry"] + ["focus_session"] * 3
+    assert [r["date"] for r in records if r["type"] == "habit_log"] == ["2026-05-01", "2026-05-02", "2026-05-03"]
+    assert records[1]["completed"] is True
+
+    response = client.get("/api/export", params={"format": "csv"}, headers=auth_headers)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == len(records)
+    assert rows[0]["type"] == "habit" and rows[0]["name"] == habit["name"]
+    assert rows[1]["completed"] == "true" and rows[1]["name"] == ""
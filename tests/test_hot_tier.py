@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from hot_tier import HotTier
+
+
+@pytest.fixture
+def hot_tier(client, monkeypatch):
+    tier = HotTier(server.shards, days=7, max_users=100, log_columns=server.habit_log_encoder.columns,
+                   mood_columns=server.mood_entry_encoder.columns)
+    monkeypatch.setattr(server, "hot_tier", tier)
+    yield tier
+    client.portal.call(tier.drain)
+
+
+def test_hot_tier_serves_recent_days_and_writes_behind(client, auth_headers, hot_tier, monkeypatch):
+    today = datetime.utcnow().date()
+    days = [str(today - timedelta(days=offset)) for offset in (1, 0)]
+    habit = client.post("/api/habits", json={"name": "Walk"}, headers=auth_headers).json()
+    for day in days:
+        first = client.post("/api/habits/log", json={"habit_id": habit["id"], "date": day, "completed": True},
+                            headers=auth_headers).json()
+        again = client.post("/api/habits/log", json={"habit_id": habit["id"], "date": day, "completed": False},
+                            headers=auth_headers).json()
+        assert again["id"] == first["id"] and again["completed"] is False
+        first = client.post("/api/mood", json={"mood_level": 2, "energy_level": 3, "sleep_hours": 6, "date": day},
+                            headers=auth_headers).json()
+        again = client.post("/api/mood", json={"mood_level": 4, "energy_level": 3, "sleep_hours": 6, "date": day},
+                            headers=auth_headers).json()
+        assert again["id"] == first["id"] and again["mood_level"] == 4
+    assert hot_tier.writes_behind == 8
+
+    # Writes outside the hot tier replace the window
+    client.post("/api/habits/log/batch", json=[{"habit_id": habit["id"], "date": days[1], "completed": True}],
+                headers=auth_headers)
+
+    hits = hot_tier.hits
+    queries = [
+        ("/api/habits/logs", {"from": days[0]}),
+        ("/api/habits/logs", {"from": days[0], "to": days[0], "habit_id": habit["id"]}),
+        ("/api/habits/logs", {"from": days[0], "limit": 1}),
+        ("/api/mood", {"from": days[0]}),
+        ("/api/mood", {"from": days[1], "limit": 1}),
+    ]
+    hot = [client.get(path, params=params, headers=auth_headers) for path, params in queries]
+    assert hot_tier.hits >= hits + len(queries) - 1
+    assert [(log["date"], log["completed"]) for log in hot[0].json()] == [(days[1], True), (days[0], False)]
+    assert "hot_tier" in client.get("/api/health").json()
+
+    # The database serves the very same responses once the hot tier is off
+    monkeypatch.setattr(server, "hot_tier", None)
+    client.portal.call(hot_tier.drain)
+    cold = [client.get(path, params=params, headers=auth_headers) for path, params in queries]
+    for hot_response, cold_response in zip(hot, cold):
+        assert hot_response.content == cold_response.content
+        assert hot_response.headers.get(server.NEXT_CURSOR_HEADER) == cold_response.headers.get(server.NEXT_CURSOR_HEADER)
@@ -0,0 +1,44 @@
+import json
+import uuid
+
+import server
+
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record) for record in records).encode()
+
+
+def test_import_writes_valid_rows_in_chunks_and_reports_errors(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(server, "IMPORT_CHUNK_SIZE", 2)
+    habit_id = str(uuid.uuid4())
+    body = ndjson(
+        {"type": "habit", "id": habit_id, "name": "Meditate"},
+        {"type": "habit_log", "habit_id": habit_id, "date": "2024-01-01", "completed": True},
+        {"type": "habit_log", "habit_id": habit_id, "date": "2024-01-02", "completed": False},
+        {"type": "habit_log", "habit_id": str(uuid.uuid4()), "date": "2024-01-02", "completed": True},
+        {"type": "mood_entry", "mood_level": 4, "energy_level": 2, "sleep_hours": 6.5, "date": "2024-01-01"},
+        {"type": "mood_entry", "mood_level": 4, "energy_level": 2, "sleep_hours": 6.5, "date": "2024-02-30"},
+        {"type": "focus_session", "task_name": "Read", "duration_minutes": 45, "date": "2024-01-01"},
+        {"type": "weather", "date": "2024-01-01"},
+    ) + b"\n{not json\n"
+
+    report = client.post("/api/import", content=body, headers=auth_headers).json()
+    assert report["state"] == "completed"
+    assert (report["rows_read"], report["rows_imported"], report["rows_failed"]) == (9, 5, 4)
+    assert sorted((e["row"], e["error"]) for e in report["errors"]) == [
+        (4, "Unknown habit"),
+        (6, "date must be YYYY-MM-DD"),
+        (8, "Unknown type 'weather'"),
+        (9, "Invalid JSON: Expecting property name enclosed in double quotes: line 1 column 2 (char 1)"),
+    ]
+    assert client.get("/api/import/progress", headers=auth_headers).json() == report
+
+    logs = client.get("/api/habits/logs", params={"habit_id": habit_id}, headers=auth_headers).json()
+    assert [(log["date"], log["completed"]) for log in logs] == [("2024-01-02", False), ("2024-01-01", True)]
+
+    # Re-importing an export changes nothing
+    exported = client.get("/api/export", params={"format": "csv"}, headers=auth_headers).content
+    report = client.post("/api/import", params={"format": "csv"}, content=exported, headers=auth_headers).json()
+    assert (report["rows_imported"], report["rows_failed"]) == (5, 0)
+    again = client.get("/api/export", params={"format": "csv"}, headers=auth_headers).content
+    assert again.count(b"\n") == exported.count(b"\n")
@@ -0,0 +1,42 @@
+import re
+
+
+def sample(text, name, **labels):
+    """Value of the sample ``name`` with exactly ``labels``, or None."""
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    series = f"{name}{{{wanted}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_report_routes_statements_and_gauges(client, auth_headers):
+    before = client.get("/metrics").text
+    count = sample(before, "pulse_http_request_duration_seconds_count",
+                   method="GET", route="/api/habits", status="200") or 0
+
+    client.post("/api/habits", json={"name": "Stretch"}, headers=auth_headers)
+    client.get("/api/habits", headers=auth_headers)
+    client.get("/api/habits", headers=auth_headers)
+    client.get("/api/no-such-route/123", headers=auth_headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    assert sample(text, "pulse_http_request_duration_seconds_count",
+                  method="GET", route="/api/habits", status="200") == count + 2
+    assert sample(text, "pulse_http_request_duration_seconds_bucket",
+                  method="GET", route="/api/habits", status="200", le="+Inf") == count + 2
+    # Unknown paths share one series instead of one per URL
+    assert sample(text, "pulse_http_request_duration_seconds_count",
+                  method="GET", route="unmatched", status="404") >= 1
+    assert "no-such-route" not in text
+
+    # Listing habits runs at least one SELECT within the request
+    assert sample(text, "pulse_http_request_db_statements_bucket", route="/api/habits", le="0") < \
+        sample(text, "pulse_http_request_db_statements_count", route="/api/habits")
+    assert sample(text, "pulse_db_call_duration_seconds_count", operation="select") > 0
+    assert sample(text, "pulse_http_requests_in_flight") == 1  # the scrape itself
+    assert sample(text, "pulse_db_pool_available_connections", shard="pulse_test.db") is not None
+    assert "# TYPE pulse_event_loop_lag_seconds histogram" in text
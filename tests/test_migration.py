@@ -0,0 +1,142 @@
+"""Databases created before the compact storage encoding are rewritten in
+place by init_db; see server.migrate_legacy_storage."""
+import asyncio
+import logging
+import sqlite3
+import uuid
+from datetime import date, datetime
+
+import storage_codecs
+from rebalance_shards import init_shards
+
+# The schema of the original server, which stored everything as text
+LEGACY_SCHEMA = """
+    CREATE TABLE users (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE habits (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        frequency TEXT DEFAULT 'daily',
+        color TEXT DEFAULT '#3f8cff',
+        icon TEXT DEFAULT 'checkmark-circle',
+        target_per_week INTEGER DEFAULT 7,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    CREATE TABLE habit_logs (
+        id TEXT PRIMARY KEY,
+        habit_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        date TEXT NOT NULL,
+        completed BOOLEAN DEFAULT 0,
+        notes TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(habit_id, date),
+        FOREIGN KEY (habit_id) REFERENCES habits(id) ON DELETE CASCADE,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    CREATE TABLE mood_entries (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        mood_level INTEGER NOT NULL,
+        energy_level INTEGER NOT NULL,
+        sleep_hours REAL NOT NULL,
+        notes TEXT,
+        date TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, date),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+    CREATE TABLE focus_sessions (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        task_name TEXT NOT NULL,
+        duration_minutes INTEGER NOT NULL,
+        start_time TIMESTAMP NOT NULL,
+        end_time TIMESTAMP NOT NULL,
+        date TEXT NOT NULL,
+        completed BOOLEAN DEFAULT 1,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    );
+"""
+
+HABIT_ID = "5f0c6a52-6d5e-4b8e-9a57-3c1a2b7f9d10"
+
+
+def test_legacy_text_database_is_converted(tmp_path, caplog):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+        # A non-UUID id, and created_at left to CURRENT_TIMESTAMP
+        conn.execute("INSERT INTO users (id, name, email, password_hash) VALUES ('legacy-1', 'Ada', 'ada@example.com', 'x')")
+        conn.execute("INSERT INTO habits (id, user_id, name, description) VALUES (?, 'legacy-1', 'Read', 'evening chapters')",
+                     (HABIT_ID,))
+        conn.executemany(
+            "INSERT INTO habit_logs (id, habit_id, user_id, date, completed, notes) VALUES (?, ?, 'legacy-1', ?, 1, ?)",
+            [("log-1", HABIT_ID, "2024-05-01", "finished the novel"), ("log-2", HABIT_ID, "yesterday", "")],
+        )
+        conn.execute("""INSERT INTO mood_entries (id, user_id, mood_level, energy_level, sleep_hours, notes, date)
+                        VALUES ('mood-1', 'legacy-1', 4, 3, 7.5, 'calm morning', '2024-05-01')""")
+        conn.execute("""INSERT INTO focus_sessions (id, user_id, task_name, duration_minutes, start_time, end_time, date)
+                        VALUES ('focus-1', 'legacy-1', 'Thesis draft', 25,
+                                '2024-05-01T09:00:00.250000', '2024-05-01T09:25:00.250000', '2024-05-01')""")
+
+    with caplog.at_level(logging.WARNING, logger="server"):
+        asyncio.run(init_shards([path]))
+    assert [r.getMessage() for r in caplog.records if "unconvertible" in r.getMessage()] == [
+        "Dropped 1 unconvertible rows from habit_logs",
+    ]
+
+    user_id = uuid.uuid5(storage_codecs.LEGACY_ID_NAMESPACE, "legacy-1")
+    day = date(2024, 5, 1)
+    with sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES) as conn:
+        conn.row_factory = sqlite3.Row
+        [user] = conn.execute("SELECT * FROM users").fetchall()
+        assert user["id"] == user_id
+        assert isinstance(user["created_at"], datetime)
+
+        [habit] = conn.execute("SELECT * FROM habits").fetchall()
+        assert habit["id"] == uuid.UUID(HABIT_ID) and habit["user_id"] == user_id
+
+        [log] = conn.execute("SELECT * FROM habit_logs").fetchall()
+        assert log["id"] == uuid.uuid5(storage_codecs.LEGACY_ID_NAMESPACE, "log-1")
+        assert (log["habit_id"], log["user_id"], log["date"], log["completed"]) == (uuid.UUID(HABIT_ID), user_id, day, 1)
+
+        [focus] = conn.execute("SELECT * FROM focus_sessions").fetchall()
+        assert focus["start_time"] == datetime(2024, 5, 1, 9, 0, 0, 250000)
+        assert focus["date"] == day
+
+        # Rollups and the search index are rebuilt from the converted rows
+        rollup = conn.execute("SELECT * FROM daily_rollups WHERE user_id = ?", (user_id,)).fetchone()
+        assert (rollup["date"], rollup["habits_completed"], rollup["focus_minutes"], rollup["focus_sessions"],
+                rollup["mood_level"]) == (day, 1, 25, 1, 4)
+        documents = {(row["kind"], row["title"], row["body"]) for row in conn.execute("SELECT * FROM search_documents")}
+        assert documents == {
+            ("habit", "Read", "evening chapters"),
+            ("habit_log", "", "finished the novel"),
+            ("mood_entry", "", "calm morning"),
+            ("focus_session", "Thesis draft", ""),
+        }
+        assert conn.execute(
+            "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?", (f'user_id : "{user_id.hex.upper()}" AND novel',)
+        ).fetchone()[0] == 1
+
+        # Every migrated row is numbered for /sync
+        seqs = [row[0] for table in ("habits", "habit_logs", "mood_entries", "focus_sessions")
+                for row in conn.execute(f"SELECT change_seq FROM {table}")]
+        assert sorted(seqs) == [1, 2, 3, 4]
+        assert conn.execute("SELECT seq FROM sync_sequences WHERE user_id = ?", (user_id,)).fetchone()[0] == 4
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE 'legacy_%'").fetchone()[0] == 0
+
+    # Running it again leaves the converted database alone
+    asyncio.run(init_shards([path]))
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM habit_logs").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM search_documents").fetchone()[0] == 4
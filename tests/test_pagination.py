@@ -0,0 +1,14 @@
+import base64
+import json
+
+
+def test_malformed_cursors_are_rejected(client, auth_headers):
+    def cursor(values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    bad = ["not base64!", cursor({"date": "2026-01-01"}), cursor(["2026-01-01"]), cursor(["2026-01-01", 5]),
+           cursor([20260101, "0" * 32]), cursor(["2026-13-01", "0" * 32]), cursor(["2026-01-01", "not a uuid"])]
+    for path in ("/api/habits/logs", "/api/mood", "/api/focus"):
+        for value in bad:
+            response = client.get(path, params={"cursor": value}, headers=auth_headers)
+            assert response.status_code == 400, (path, value)
@@ -0,0 +1,38 @@
+import logging
+
+import server
+from query_log import DB_TIME_HEADER, STATEMENTS_HEADER
+
+
+def test_slow_statements_are_logged_with_their_plan(client, auth_headers, caplog, monkeypatch):
+    habit = client.post("/api/habits", json={"name": "Floss"}, headers=auth_headers).json()
+    client.post("/api/habits/log", json={"habit_id": habit["id"], "date": "2026-02-01", "completed": True},
+                headers=auth_headers)
+
+    monkeypatch.setattr(server.query_log, "slow_seconds", 0)
+    with caplog.at_level(logging.WARNING, logger="query_log"):
+        client.get("/api/habits/logs", params={"from": "2026-01-01"}, headers=auth_headers)
+    logged = [r.getMessage() for r in caplog.records if "FROM habit_logs" in r.getMessage()]
+    assert logged
+    assert "1 rows, params (UUID, date, int)" in logged[0]
+    assert "SEARCH habit_logs USING INDEX" in logged[0]
+    # Parameter values never reach the log
+    assert habit["id"] not in "\n".join(logged)
+
+
+def test_chatty_requests_are_flagged(client, caplog, monkeypatch):
+    monkeypatch.setattr(server.query_log, "max_statements", 1)
+    with caplog.at_level(logging.WARNING, logger="query_log"):
+        client.post("/api/auth/register", json={"name": "Chatty", "email": "chatty@example.com", "password": "pw"})
+    flagged = [r.getMessage() for r in caplog.records if r.getMessage().startswith("POST /api/auth/register ran")]
+    assert len(flagged) == 1
+    assert "SELECT * FROM users WHERE email = ?" in flagged[0]
+
+
+def test_debug_headers_report_database_work(client, auth_headers, monkeypatch):
+    assert STATEMENTS_HEADER not in client.get("/api/habits", headers=auth_headers).headers
+
+    monkeypatch.setattr(server.query_log, "debug_headers", True)
+    response = client.get("/api/habits", headers=auth_headers)
+    assert int(response.headers[STATEMENTS_HEADER]) >= 1
+    assert float(response.headers[DB_TIME_HEADER]) > 0
@@ -0,0 +1,118 @@
+"""Every SQL statement the API issues must be served by an index.
+
+The test drives each API route against a real database while recording the
+statements passed to aiosqlite, then runs EXPLAIN QUERY PLAN on each of them
+and fails on any full table scan. Routes that are not exercised here fail the
+test too, so a new endpoint cannot bring back O(all users) reads unnoticed.
+"""
+import re
+import sqlite3
+
+import aiosqlite
+import pytest
+
+import server
+
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*VIRTUAL TABLE)")
+SKIPPED_PREFIXES = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "CREATE", "DROP", "ALTER")
+
+
+@pytest.fixture
+def recorded_statements(monkeypatch):
+    statements = []
+    original = aiosqlite.Connection.execute
+
+    def recording_execute(self, sql, parameters=None):
+        statements.append((sql, parameters))
+        return original(self, sql, parameters)
+
+    monkeypatch.setattr(aiosqlite.Connection, "execute", recording_execute)
+    return statements
+
+
+def exercise_api(client, headers):
+    """Call every API route at least once; returns the set of routes hit."""
+    hit = set()
+
+    def call(method, path, route=None, **kwargs):
+        response = client.request(method, path, headers=headers, **kwargs)
+        assert response.status_code < 500, (method, path, response.text)
+        hit.add((method, route or path))
+        return response
+
+    email = f"plan-{id(hit)}@example.com"
+    client.post("/api/auth/register", json={"name": "Plan", "email": email, "password": "pw"})
+    hit.add(("POST", "/api/auth/register"))
+    call("POST", "/api/auth/login", json={"email": email, "password": "pw"})
+    call("GET", "/api/auth/me")
+    call("GET", "/api/health")
+
+    habit = call("POST", "/api/habits", json={"name": "Read"}).json()
+    call("GET", "/api/habits")
+    for day in ("2026-01-01", "2026-01-02", "2026-01-02"):
+        call("POST", "/api/habits/log", json={"habit_id": habit["id"], "date": day, "completed": True})
+        call("POST", "/api/mood", json={"mood_level": 3, "energy_level": 4, "sleep_hours": 7, "date": day})
+        call("POST", "/api/focus", json={"task_name": "Write", "duration_minutes": 25, "date": day})
+
+    call("POST", "/api/habits/log/batch", json=[
+        {"habit_id": habit["id"], "date": "2026-01-02", "completed": False},
+        {"habit_id": habit["id"], "date": "2026-01-03", "completed": True},
+    ])
+    call("POST", "/api/mood/batch", json=[
+        {"mood_level": 2, "energy_level": 2, "sleep_hours": 5, "date": "2026-01-02"},
+        {"mood_level": 4, "energy_level": 4, "sleep_hours": 8, "date": "2026-01-03"},
+    ])
+    call("POST", "/api/focus/batch", json=[{"task_name": "Plan", "duration_minutes": 15, "date": "2026-01-03"}])
+
+    for path in ("/api/habits/logs", "/api/mood", "/api/focus"):
+        first = call("GET", path, params={"limit": 1, "from": "2026-01-01", "to": "2026-12-31"})
+        call("GET", path, params={"limit": 1, "cursor": first.headers[server.NEXT_CURSOR_HEADER]})
+    call("GET", "/api/habits/logs", params={"habit_id": habit["id"]})
+
+    full = call("GET", "/api/sync", params={"limit": 1}).json()
+    call("GET", "/api/sync", params={"since": full["cursor"]})
+
+    call("GET", "/api/search", params={"q": "writ"})
+    call("GET", "/api/search", params={"q": "read", "kind": "habit", "offset": 1})
+
+    for export_format in ("ndjson", "csv"):
+        exported = call("GET", "/api/export", params={"format": export_format}).content
+        call("POST", "/api/import", params={"format": export_format}, content=exported)
+    call("GET", "/api/import/progress")
+
+    call("GET", "/api/analytics")
+    for granularity in ("day", "week", "month"):
+        call("GET", "/api/analytics", params={"from": "2026-01-01", "to": "2026-03-31", "granularity": granularity})
+    return hit
+
+
+def test_every_route_is_exercised(client, auth_headers):
+    hit = exercise_api(client, auth_headers)
+    routes = {
+        (method, route.path)
+        for route in server.app.routes
+        if route.path.startswith("/api")
+        for method in route.methods
+    }
+    missing = routes - hit
+    assert not missing, f"Add these routes to exercise_api: {sorted(missing)}"
+
+
+def test_no_statement_scans_a_whole_table(client, auth_headers, recorded_statements):
+    exercise_api(client, auth_headers)
+    assert recorded_statements
+
+    conn = sqlite3.connect(server.DB_PATH)
+    offenders = []
+    try:
+        for sql, params in recorded_statements:
+            if sql.lstrip().upper().startswith(SKIPPED_PREFIXES):
+                continue
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            scans = [detail for _, _, _, detail in plan if FULL_SCAN.match(detail)]
+            if scans:
+                offenders.append((" ".join(sql.split()), scans))
+    finally:
+        conn.close()
+
+    assert not offenders, "Full table scans:\n" + "\n".join(f"{sql}\n    {scans}" for sql, scans in offenders)
@@ -0,0 +1,21 @@
+def test_search_is_ranked_scoped_and_reindexed(client, auth_headers):
+    other = client.post("/api/auth/register", json={"name": "Other", "email": "search-other@example.com", "password": "pw"})
+    other_headers = {"Authorization": f"Bearer {other.json()['access_token']}"}
+    client.post("/api/habits", json={"name": "Swim laps"}, headers=other_headers)
+
+    habit = client.post("/api/habits", json={"name": "Swimming", "description": "Pool before work"}, headers=auth_headers).json()
+    client.post("/api/habits/log", json={"habit_id": habit["id"], "date": "2026-03-01", "completed": True, "notes": "cold pool"}, headers=auth_headers)
+
+    results = client.get("/api/search", params={"q": "swim"}, headers=auth_headers).json()
+    assert [r["id"] for r in results] == [habit["id"]]
+    assert results[0]["title"] == "<mark>Swimming</mark>"
+
+    pool = client.get("/api/search", params={"q": "POOL"}, headers=auth_headers).json()
+    assert {r["kind"] for r in pool} == {"habit", "habit_log"}
+
+    # Operators and quotes are treated as plain words, never as FTS syntax
+    assert client.get("/api/search", params={"q": '"pool OR NOT*'}, headers=auth_headers).status_code == 200
+
+    client.post("/api/habits/log", json={"habit_id": habit["id"], "date": "2026-03-01", "completed": True, "notes": "lake instead"}, headers=auth_headers)
+    assert client.get("/api/search", params={"q": "cold"}, headers=auth_headers).json() == []
+    assert len(client.get("/api/search", params={"q": "lake"}, headers=auth_headers).json()) == 1
@@ -0,0 +1,81 @@
+import asyncio
+import sqlite3
+import uuid
+
+import server
+from rebalance_shards import init_shards, rebalance
+from shards import shard_index, shard_paths
+
+
+def register(client, email):
+    return client.post("/api/auth/register", json={"name": "Shard User", "email": email, "password": "SecurePass123!"})
+
+
+def test_users_and_their_rows_live_on_their_shard(client):
+    assert len(server.shards) == 2
+    users = {}
+    for i in range(8):
+        email = f"shard-{uuid.uuid4().hex[:12]}@example.com"
+        body = register(client, email).json()
+        headers = {"Authorization": f"Bearer {body['access_token']}"}
+        client.post("/api/mood", json={"mood_level": 3, "energy_level": 3, "sleep_hours": 7, "date": "2024-03-01"},
+                    headers=headers)
+        users[uuid.UUID(body["user"]["id"])] = email
+    assert {shard_index(user_id, 2) for user_id in users} == {0, 1}
+
+    for user_id in users:
+        for index, path in enumerate(shard_paths(server.DB_PATH, 2)):
+            with sqlite3.connect(path) as conn:
+                rows = conn.execute("SELECT COUNT(*) FROM mood_entries WHERE user_id = ?", (user_id,)).fetchone()[0]
+            assert rows == (1 if index == shard_index(user_id, 2) else 0)
+
+    # Emails stay unique across shards, and login finds the user wherever they are
+    for email in users.values():
+        assert register(client, email).status_code == 400
+        assert client.post("/api/auth/login", json={"email": email, "password": "SecurePass123!"}).status_code == 200
+
+
+def seed(path, user_count):
+    with sqlite3.connect(path) as conn:
+        for i in range(user_count):
+            user_id, habit_id = uuid.uuid4(), uuid.uuid4()
+            conn.execute("INSERT INTO users (id, name, email, password_hash) VALUES (?, 'U', ?, 'x')",
+                         (user_id, f"{user_id}@example.com"))
+            conn.execute("INSERT INTO habits (id, user_id, name) VALUES (?, ?, 'Stretch')", (habit_id, user_id))
+            conn.execute("INSERT INTO habit_logs (id, habit_id, user_id, date, completed) VALUES (?, ?, ?, 19800, 1)",
+                         (uuid.uuid4(), habit_id, user_id))
+            conn.execute("UPDATE habits SET name = 'Stretching' WHERE id = ?", (habit_id,))
+
+
+def snapshot(paths):
+    """Every user's rows, sync state and derived rows, wherever they are stored."""
+    rows = set()
+    for path in paths:
+        with sqlite3.connect(path) as conn:
+            rows |= {("user",) + row for row in conn.execute("SELECT id, email FROM users")}
+            rows |= {("habit",) + row for row in conn.execute("SELECT id, user_id, name, change_seq FROM habits")}
+            rows |= {("log",) + row for row in conn.execute("SELECT id, user_id, date, change_seq FROM habit_logs")}
+            rows |= {("seq",) + row for row in conn.execute("SELECT user_id, seq FROM sync_sequences")}
+            rows |= {("rollup",) + row for row in conn.execute("SELECT user_id, date, habits_completed FROM daily_rollups")}
+            rows |= {("search",) + row for row in conn.execute("SELECT record_id, title FROM search_documents")}
+    return rows
+
+
+def test_rebalance_moves_users_to_their_new_shard(tmp_path):
+    db_path = tmp_path / "pulse.db"
+    asyncio.run(init_shards([db_path]))
+    seed(db_path, 20)
+    before = snapshot([db_path])
+
+    assert rebalance(db_path, 1, 3) > 0
+    paths = shard_paths(db_path, 3)
+    assert snapshot(paths) == before
+    for index, path in enumerate(paths):
+        with sqlite3.connect(path) as conn:
+            user_ids = [uuid.UUID(bytes=row[0]) for row in conn.execute("SELECT id FROM users")]
+            assert conn.execute("SELECT COUNT(*) FROM habits WHERE user_id NOT IN (SELECT id FROM users)").fetchone()[0] == 0
+        assert all(shard_index(user_id, 3) == index for user_id in user_ids)
+
+    assert rebalance(db_path, 3, 3) == 0
+    rebalance(db_path, 3, 1)
+    assert snapshot([db_path]) == before
@@ -0,0 +1,82 @@
+import sqlite3
+import uuid
+
+import server
+
+
+def sync_all(client, headers, since=None, limit=None):
+    """Follow has_more until caught up; returns (records by table, cursor)."""
+    seen = {}
+    while True:
+        params = {k: v for k, v in (("since", since), ("limit", limit)) if v is not None}
+        body = client.get("/api/sync", params=params, headers=headers).json()
+        for table in ("habits", "habit_logs", "mood_entries", "focus_sessions"):
+            for record in body[table]:
+                seen.setdefault(table, {})[record["id"]] = record
+        since = body["cursor"]
+        if not body["has_more"]:
+            return seen, since
+
+
+def test_sync_returns_only_changes_since_cursor(client, auth_headers):
+    habit = client.post("/api/habits", json={"name": "Stretch"}, headers=auth_headers).json()
+    for day in ("2026-02-01", "2026-02-02", "2026-02-03"):
+        client.post("/api/habits/log", json={"habit_id": habit["id"], "date": day, "completed": True}, headers=auth_headers)
+        client.post("/api/mood", json={"mood_level": 3, "energy_level": 3, "sleep_hours": 7, "date": day}, headers=auth_headers)
+
+    seen, cursor = sync_all(client, auth_headers, limit=2)
+    assert len(seen["habits"]) == 1
+    assert len(seen["habit_logs"]) == 3
+    assert len(seen["mood_entries"]) == 3
+
+    idle = client.get("/api/sync", params={"since": cursor}, headers=auth_headers).json()
+    assert idle["cursor"] == cursor
+    assert not any(idle[table] for table in ("habits", "habit_logs", "mood_entries", "focus_sessions"))
+
+    # Re-logging an existing day is an update and must show up again
+    client.post("/api/habits/log", json={"habit_id": habit["id"], "date": "2026-02-02", "completed": False}, headers=auth_headers)
+    changed, new_cursor = sync_all(client, auth_headers, since=cursor)
+    assert new_cursor > cursor
+    assert list(changed) == ["habit_logs"]
+    [log] = changed["habit_logs"].values()
+    assert log["date"] == "2026-02-02" and log["completed"] is False
+
+
+def test_sync_rejects_cursors_beyond_sqlite_integers(client, auth_headers):
+    assert client.get("/api/sync", params={"since": 2**63 - 1}, headers=auth_headers).status_code == 200
+    assert client.get("/api/sync", params={"since": 2**63}, headers=auth_headers).status_code == 422
+
+
+def test_sync_pages_through_rows_written_before_sync_existed(client, auth_headers):
+    user_id = uuid.UUID(client.get("/api/auth/me", headers=auth_headers).json()["id"])
+    habit = client.post("/api/habits", json={"name": "Read"}, headers=auth_headers).json()
+    for day in range(1, 11):
+        client.post("/api/habits/log", json={"habit_id": habit["id"], "date": f"2026-03-{day:02d}", "completed": True},
+                    headers=auth_headers)
+
+    # As migrated or bulk-loaded rows are: never stamped by the sync triggers
+    pool = server.shards.pool(user_id)
+    with sqlite3.connect(pool.path) as conn:
+        for table in ("habits", "habit_logs"):
+            conn.execute(f"UPDATE {table} SET change_seq = 0 WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM sync_sequences WHERE user_id = ?", (user_id,))
+    client.portal.call(server.init_db, pool)
+
+    pages = []
+    since = None
+    while True:
+        params = {"limit": 3} if since is None else {"limit": 3, "since": since}
+        body = client.get("/api/sync", params=params, headers=auth_headers).json()
+        pages.append(body)
+        since = body["cursor"]
+        if not body["has_more"]:
+            break
+    assert all(len(page[table]) <= 3 for page in pages for table in ("habits", "habit_logs"))
+    assert len({log["id"] for page in pages for log in page["habit_logs"]}) == 10
+    assert [h["id"] for page in pages for h in page["habits"]] == [habit["id"]]
+
+    # New writes continue the sequence after the renumbered rows
+    client.post("/api/habits/log", json={"habit_id": habit["id"], "date": "2026-03-11", "completed": True},
+                headers=auth_headers)
+    changed, _ = sync_all(client, auth_headers, since=since)
+    assert [log["date"] for log in changed["habit_logs"].values()] == ["2026-03-11"]